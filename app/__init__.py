@@ -13,10 +13,54 @@ def create_app():
     # Attach MySQL to the app instance
     app.mysql = mysql
 
+    # Optional server-side session store
+    from .sessions import init_session_store
+    init_session_store(app)
+
+    # Login attempt limits
+    from .throttle import login_throttle
+    login_throttle.init_app(app)
+
+    # Restore the streaming category popularity tracker
+    from .popularity import popularity
+    popularity.init_app(app)
+
+    # Restore the category co-occurrence index
+    from .recommend import recommendations
+    recommendations.init_app(app)
+
     # Register Blueprints
     from .auth import auth_bp
     from .routes import routes_bp
+    from .labels import labels_bp
+    from .picking import picking_bp
+    from .events import events_bp
+    from .jobs import jobs_bp
+    from .archive import archive_bp
+    from .lifecycle import orders_bp
+    from .assignment import assignment_bp
+    from .wishlist import wishlist_bp
+    from .dedupe import duplicates_bp
+    from .movements import movements_bp
+    from .cyclecount import cyclecount_bp
+    from .locations import locations_bp
     app.register_blueprint(auth_bp)
     app.register_blueprint(routes_bp)
+    app.register_blueprint(labels_bp)
+    app.register_blueprint(picking_bp)
+    app.register_blueprint(events_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(archive_bp)
+    app.register_blueprint(orders_bp)
+    app.register_blueprint(assignment_bp)
+    app.register_blueprint(wishlist_bp)
+    app.register_blueprint(duplicates_bp)
+    app.register_blueprint(movements_bp)
+    app.register_blueprint(cyclecount_bp)
+    app.register_blueprint(locations_bp)
+
+    # Register CLI commands
+    from .commands import register_commands
+    register_commands(app)
 
     return app
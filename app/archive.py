@@ -0,0 +1,102 @@
+from flask import Blueprint, jsonify, request, session, current_app
+from .jobs import enqueue, job_type
+from .utils import login_required, has_role
+
+archive_bp = Blueprint('archive', __name__)
+
+# Hot table -> archive table and the columns copied, in the order rows are
+# copied. Columns are listed so a column added to one table (or in a
+# different position) can't silently shift values between them.
+ARCHIVED_TABLES = (
+    ('Ordered', 'OrderedArchive', ('orderID', 'orderDate', 'orderNotes', 'supervisor', 'client')),
+    ('ItemIn', 'ItemInArchive', ('ItemID', 'orderID', 'found')),
+    ('Delivered', 'DeliveredArchive', ('userName', 'orderID', 'status', 'date')),
+)
+
+
+def order_tables(include_archive=False):
+    """SQL table expressions for Ordered, ItemIn and Delivered.
+
+    With include_archive, each is a UNION ALL of the hot and archive table
+    (aliased by the caller as usual); otherwise the plain hot table.
+    """
+    tables = {}
+    for hot, cold, columns in ARCHIVED_TABLES:
+        columns = ', '.join(columns)
+        tables[hot] = (f"(SELECT {columns} FROM {hot} UNION ALL SELECT {columns} FROM {cold})"
+                       if include_archive else hot)
+    return tables
+
+
+def _archivable_orders(cursor, days, statuses, limit):
+    placeholders = ', '.join(['%s'] * len(statuses))
+    cursor.execute(f"""
+        SELECT orderID
+        FROM Delivered
+        GROUP BY orderID
+        HAVING MAX(date) < CURRENT_DATE() - INTERVAL %s DAY
+           AND SUM(status NOT IN ({placeholders})) = 0
+        ORDER BY orderID
+        LIMIT %s
+    """, (days, *statuses, limit))
+    return [row['orderID'] for row in cursor.fetchall()]
+
+
+@job_type('archive_orders')
+def archive_orders(job, payload):
+    """Job handler: move completed orders older than the cutoff to the archive tables.
+
+    Each chunk of orders is copied and deleted in one transaction, so a
+    cancelled or failed run leaves every order either hot or archived.
+    """
+    days = int(payload.get('days') or current_app.config['ARCHIVE_AFTER_DAYS'])
+    batch_size = current_app.config['ARCHIVE_BATCH_SIZE']
+    statuses = current_app.config['ARCHIVE_STATUSES']
+    connection = current_app.mysql.connection
+    cursor = connection.cursor()
+    archived = 0
+    try:
+        placeholders = ', '.join(['%s'] * len(statuses))
+        cursor.execute(f"""
+            SELECT COUNT(*) AS total FROM (
+                SELECT orderID
+                FROM Delivered
+                GROUP BY orderID
+                HAVING MAX(date) < CURRENT_DATE() - INTERVAL %s DAY
+                   AND SUM(status NOT IN ({placeholders})) = 0
+            ) due
+        """, (days, *statuses))
+        total = cursor.fetchone()['total']
+
+        while True:
+            order_ids = _archivable_orders(cursor, days, statuses, batch_size)
+            if not order_ids:
+                break
+            placeholders = ', '.join(['%s'] * len(order_ids))
+            for hot, cold, columns in ARCHIVED_TABLES:
+                columns = ', '.join(columns)
+                cursor.execute(f"INSERT INTO {cold} ({columns}) SELECT {columns} FROM {hot} "
+                               f"WHERE orderID IN ({placeholders})", tuple(order_ids))
+            for hot, _, _ in reversed(ARCHIVED_TABLES):
+                cursor.execute(f"DELETE FROM {hot} WHERE orderID IN ({placeholders})", tuple(order_ids))
+            archived += len(order_ids)
+            # progress() commits this chunk
+            job.progress(100 * archived // max(total, 1), f"Archived {archived} of {total} orders")
+    finally:
+        cursor.close()
+    return {'archived': archived, 'days': days}
+
+
+@archive_bp.route('/archive_orders', methods=['POST'])
+@login_required
+def start_archive():
+    """Queue an archival run for orders completed more than N days ago."""
+    if not has_role('staff'):
+        return jsonify({'error': 'Access denied.'}), 403
+
+    days = request.form.get('days', '').strip() or str(current_app.config['ARCHIVE_AFTER_DAYS'])
+    if not days.isdigit():
+        return jsonify({'error': 'Days must be a valid number.'}), 400
+
+    job_id = enqueue('archive_orders', {'days': int(days)}, session['username'])
+    return jsonify({'jobID': job_id, 'status': f'/jobs/{job_id}'}), 202
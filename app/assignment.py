@@ -0,0 +1,248 @@
+import heapq
+from datetime import date
+from flask import Blueprint, jsonify, request, session, current_app
+from .cache import invalidate_user_tasks
+from .lifecycle import PREPARED
+from .loadplan import plan_loads
+from .utils import login_required, has_role
+
+assignment_bp = Blueprint('assignment', __name__)
+
+
+def balance_assignments(orders, volunteers):
+    """Distribute orders across volunteers, balancing volume and order count.
+
+    orders: list of dicts with orderID and volume.
+    volunteers: list of dicts with userName, maxOrders and maxVolume
+    (None for no limit).
+
+    Orders are placed largest first on the least loaded volunteer with room
+    for them, where load is the larger of the volume and order count
+    fractions of that volunteer's stated capacity. Volunteers live in a heap
+    keyed by load, so each placement costs O(log m) unless capacity forces
+    skipping full volunteers. Returns (assignments, unassigned) with
+    assignments mapping orderID -> userName.
+    """
+    share = max(len(volunteers), 1)
+    # Volunteers without a stated limit are measured against an even share
+    fair_volume = max(sum(order['volume'] for order in orders) / share, 1)
+    fair_orders = max(len(orders) / share, 1)
+    state = {}
+    for volunteer in volunteers:
+        state[volunteer['userName']] = {
+            'maxOrders': volunteer['maxOrders'],
+            'maxVolume': volunteer['maxVolume'],
+            'orderScale': volunteer['maxOrders'] or fair_orders,
+            'volumeScale': volunteer['maxVolume'] or fair_volume,
+            'orders': 0,
+            'volume': 0,
+        }
+
+    def load(name):
+        entry = state[name]
+        return max(entry['orders'] / entry['orderScale'], entry['volume'] / entry['volumeScale'])
+
+    def fits(name, order):
+        entry = state[name]
+        return ((entry['maxOrders'] is None or entry['orders'] < entry['maxOrders'])
+                and (entry['maxVolume'] is None or entry['volume'] + order['volume'] <= entry['maxVolume']))
+
+    heap = [(0.0, name) for name in sorted(state)]
+    heapq.heapify(heap)
+    assignments, unassigned = {}, []
+    for order in sorted(orders, key=lambda order: order['volume'], reverse=True):
+        skipped, chosen = [], None
+        while heap:
+            current, name = heapq.heappop(heap)
+            if fits(name, order):
+                chosen = name
+                break
+            skipped.append((current, name))
+        # Volunteers too full for this order may still take a smaller one
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+
+        if chosen is None:
+            unassigned.append(order['orderID'])
+            continue
+        state[chosen]['orders'] += 1
+        state[chosen]['volume'] += order['volume']
+        assignments[order['orderID']] = chosen
+        heapq.heappush(heap, (load(chosen), chosen))
+
+    return assignments, unassigned
+
+
+def load_prepared_orders(cursor, order_ids=None):
+    """Prepared orders with their current assignee and total piece volume."""
+    where = ''
+    params = [PREPARED]
+    if order_ids:
+        where = f"AND d.orderID IN ({', '.join(['%s'] * len(order_ids))})"
+        params.extend(order_ids)
+    cursor.execute(f"""
+        SELECT d.orderID, d.userName,
+               COALESCE(SUM(p.length * p.width * p.height), 0) AS volume
+        FROM Delivered d
+        LEFT JOIN ItemIn ii ON ii.orderID = d.orderID
+        LEFT JOIN Piece p ON p.itemID = ii.ItemID
+        WHERE d.status = %s {where}
+        GROUP BY d.orderID, d.userName
+    """, tuple(params))
+    return [{**row, 'volume': int(row['volume'])} for row in cursor.fetchall()]
+
+
+def load_available_volunteers(cursor, day):
+    cursor.execute("""
+        SELECT userName, maxOrders, maxVolume
+        FROM VolunteerAvailability
+        WHERE availableDate = %s
+    """, (day,))
+    return cursor.fetchall()
+
+
+def requested_order_ids(payload):
+    """Return the optional ``orderIDs`` list from a request payload, or None."""
+    order_ids = payload.get('orderIDs') or None
+    if order_ids is None:
+        return None
+    if not isinstance(order_ids, list) or not all(str(order_id).isdigit() for order_id in order_ids):
+        raise ValueError('orderIDs must be a list of order IDs.')
+    return [int(order_id) for order_id in order_ids]
+
+
+@assignment_bp.route('/deliveries/availability', methods=['POST'])
+@login_required
+def set_availability():
+    """Record the current volunteer's availability and capacity for a day."""
+    if not has_role('volunteer'):
+        return jsonify({'error': 'Access denied. Only volunteers can state availability.'}), 403
+
+    payload = request.get_json(silent=True) or request.form
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    try:
+        day = date.fromisoformat(str(payload.get('date', '')).strip())
+        max_orders = int(payload['maxOrders']) if payload.get('maxOrders') not in (None, '') else None
+        max_volume = int(payload['maxVolume']) if payload.get('maxVolume') not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Date must be YYYY-MM-DD; capacities must be numbers.'}), 400
+
+    connection = current_app.mysql.connection
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO VolunteerAvailability (userName, availableDate, maxOrders, maxVolume)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE maxOrders = VALUES(maxOrders), maxVolume = VALUES(maxVolume)
+        """, (session['username'], day, max_orders, max_volume))
+        connection.commit()
+    finally:
+        cursor.close()
+    return jsonify({'userName': session['username'], 'date': day.isoformat(),
+                    'maxOrders': max_orders, 'maxVolume': max_volume})
+
+
+@assignment_bp.route('/deliveries/assign', methods=['POST'])
+@login_required
+def assign_deliveries():
+    """Balance prepared orders across the volunteers available on a day."""
+    if not has_role('staff'):
+        return jsonify({'error': 'Access denied.'}), 403
+
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    try:
+        day = date.fromisoformat(str(payload.get('date') or date.today().isoformat()))
+    except ValueError:
+        return jsonify({'error': 'Date must be in YYYY-MM-DD format.'}), 400
+    try:
+        order_ids = requested_order_ids(payload)
+    except ValueError:
+        return jsonify({'error': 'orderIDs must be a list of order IDs.'}), 400
+    dry_run = bool(payload.get('dryRun'))
+
+    connection = current_app.mysql.connection
+    cursor = connection.cursor()
+    try:
+        orders = load_prepared_orders(cursor, order_ids)
+        volunteers = load_available_volunteers(cursor, day)
+        if not volunteers:
+            return jsonify({'error': f'No volunteers have stated availability for {day}.'}), 409
+
+        assignments, unassigned = balance_assignments(orders, volunteers)
+        previous = {order['orderID']: order['userName'] for order in orders}
+        changes = [(name, order_id) for order_id, name in assignments.items() if previous[order_id] != name]
+        if changes and not dry_run:
+            cursor.executemany("UPDATE Delivered SET userName = %s WHERE orderID = %s", changes)
+            connection.commit()
+            invalidate_user_tasks(*{name for name, _ in changes}, *{previous[order_id] for _, order_id in changes})
+    except Exception as e:
+        connection.rollback()
+        current_app.logger.error(f"Error in assign_deliveries: {e}")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+
+    volumes = {order['orderID']: order['volume'] for order in orders}
+    totals = {volunteer['userName']: {'orders': 0, 'volume': 0} for volunteer in volunteers}
+    for order_id, name in assignments.items():
+        totals[name]['orders'] += 1
+        totals[name]['volume'] += volumes[order_id]
+    return jsonify({
+        'date': day.isoformat(),
+        'dryRun': dry_run,
+        'assignments': {str(order_id): name for order_id, name in assignments.items()},
+        'changed': len(changes),
+        'unassigned': unassigned,
+        'totals': totals,
+    })
+
+
+@assignment_bp.route('/deliveries/loadplan', methods=['POST'])
+@login_required
+def load_plan():
+    """Pack the pieces of prepared orders into vehicle trips."""
+    if not has_role('staff', 'volunteer'):
+        return jsonify({'error': 'Access denied.'}), 403
+
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    try:
+        order_ids = requested_order_ids(payload)
+    except ValueError:
+        return jsonify({'error': 'orderIDs must be a list of order IDs.'}), 400
+    vehicles = payload.get('vehicles') or list(current_app.config['DELIVERY_VEHICLES'])
+    if not isinstance(vehicles, list) or not all(isinstance(v, dict) for v in vehicles):
+        return jsonify({'error': 'vehicles must be a list of objects.'}), 400
+    try:
+        vehicles = [{'name': str(v['name']), 'length': float(v['length']),
+                     'width': float(v['width']), 'height': float(v['height'])} for v in vehicles]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Each vehicle needs a name, length, width and height.'}), 400
+    if not vehicles or len({v['name'] for v in vehicles}) != len(vehicles):
+        return jsonify({'error': 'Vehicles must be a non-empty list with unique names.'}), 400
+
+    where = ''
+    params = [PREPARED]
+    if order_ids:
+        where = f"AND d.orderID IN ({', '.join(['%s'] * len(order_ids))})"
+        params.extend(order_ids)
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT d.orderID, p.itemID, p.pieceNum, p.length, p.width, p.height
+            FROM Delivered d
+            JOIN ItemIn ii ON ii.orderID = d.orderID
+            JOIN Piece p ON p.itemID = ii.ItemID
+            WHERE d.status = %s {where}
+        """, tuple(params))
+        pieces = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    plan = plan_loads(pieces, vehicles)
+    plan['trips'] = sum(len(trips) for trips in plan['vehicles'].values())
+    return jsonify(plan)
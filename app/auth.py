@@ -1,5 +1,11 @@
-from flask import Blueprint, request, render_template, redirect, flash, session, current_app
-from .utils import hash_password, verify_password
+import os
+import tempfile
+from flask import Blueprint, jsonify, request, render_template, redirect, flash, session, abort, current_app
+from . import provisioning  # registers the 'provision_users' job
+from .jobs import enqueue, get_job
+from .sessions import revoke_user_sessions
+from .throttle import login_throttle
+from .utils import hash_password, verify_password, needs_rehash, resolve_roles, has_role, login_required
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -60,6 +66,55 @@ def register():
     return render_template('register.html', roles=roles)
 
 
+@auth_bp.route('/bulk_register', methods=['GET', 'POST'])
+@login_required
+def bulk_register():
+    """Provision a cohort of users from an uploaded CSV file."""
+    if not has_role('staff'):
+        flash('Access denied. Only staff members can register users in bulk.', 'danger')
+        return redirect('/dashboard')
+
+    if request.method == 'POST':
+        upload = request.files.get('usersFile')
+        if not upload or not upload.filename:
+            flash('Error: Please choose a CSV file to upload.', 'danger')
+            return redirect('/bulk_register')
+
+        # Hashing a cohort takes a while, so a background job does it
+        upload_dir = current_app.config['PROVISION_UPLOAD_DIR']
+        os.makedirs(upload_dir, exist_ok=True)
+        provisioning.expire_uploads(upload_dir, current_app.config['PROVISION_UPLOAD_KEEP_HOURS'] * 3600)
+        handle, path = tempfile.mkstemp(prefix='users-', suffix='.csv', dir=upload_dir)
+        with os.fdopen(handle, 'wb') as users_file:
+            upload.save(users_file)
+        try:
+            job_id = enqueue('provision_users', {'path': os.path.abspath(path)}, session['username'])
+        except Exception as e:
+            os.remove(path)
+            current_app.logger.error(f"Error in bulk_register: {e}")
+            flash(f'An unexpected error occurred during bulk registration: {e}', 'danger')
+            return redirect('/bulk_register')
+
+        flash('Registering users in the background.', 'success')
+        return redirect(f'/bulk_register/{job_id}')
+
+    return render_template('bulk_register.html', job=None)
+
+
+@auth_bp.route('/bulk_register/<int:job_id>')
+@login_required
+def bulk_register_result(job_id):
+    """Progress and report of a bulk registration job."""
+    job = get_job(job_id)
+    if job is None or job['jobType'] != 'provision_users' or not has_role('staff'):
+        abort(404)
+    if job['status'] in ('failed', 'cancelled'):
+        flash(f"Bulk registration failed: {job['message']}", 'danger')
+    elif job['status'] == 'done' and job['result']['failed']:
+        flash(f"Bulk registration {job['result']['failed']}", 'danger')
+    return render_template('bulk_register.html', job=job)
+
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """User login route."""
@@ -67,6 +122,12 @@ def login():
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '').strip()
 
+        # Shed excess attempts before touching the database or bcrypt
+        wait = login_throttle.check(username, request.remote_addr or 'unknown')
+        if wait:
+            flash(f'Too many login attempts. Please try again in {int(wait) + 1} seconds.', 'danger')
+            return render_template('login.html'), 429
+
         cursor = current_app.mysql.connection.cursor()
         try:
             # Fetch user data
@@ -82,22 +143,39 @@ def login():
                 flash('Invalid password.', 'danger')
                 return redirect('/login')
 
-            # Fetch the role
+            # Upgrade hashes made at a different cost while we have the plaintext
+            if needs_rehash(user['password'].encode('utf-8')):
+                try:
+                    cursor.execute(
+                        "UPDATE Person SET password = %s WHERE userName = %s",
+                        (hash_password(password).decode('utf-8'), username),
+                    )
+                    current_app.mysql.connection.commit()
+                except Exception as e:
+                    current_app.logger.error(f"Could not rehash password for {username}: {e}")
+
+            # Fetch every role the user holds
             cursor.execute("""
                 SELECT Role.rDescription
                 FROM Act
                 JOIN Role ON Act.roleID = Role.roleID
                 WHERE Act.userName = %s
             """, (username,))
-            role = cursor.fetchone()
+            roles = resolve_roles(row['rDescription'] for row in cursor.fetchall())
 
-            # Assign role to session
+            # Server-side sessions get a fresh ID on login
+            if hasattr(session, 'rotate'):
+                session.rotate()
+
+            # Assign roles to session, resolved once here instead of on every request
             session['user_id'] = user['userName']
             session['username'] = user['userName']
-            session['role'] = role['rDescription'].lower() if role else 'no role'
+            session['role'] = ', '.join(roles) if roles else 'no role'
+            session['roles'] = roles
+            login_throttle.succeeded(username)
 
             # Debug log
-            print(f"Session role assigned during login: {session['role']}")
+            print(f"Session roles assigned during login: {session['role']}")
 
             flash('Login successful!', 'success')
             return redirect('/dashboard')
@@ -117,3 +195,29 @@ def logout():
     session.clear()
     flash('You have been logged out.', 'success')
     return redirect('/login')
+
+
+@auth_bp.route('/revoke_sessions', methods=['POST'])
+@login_required
+def revoke_sessions():
+    """Log a user out everywhere by deleting their server-side sessions."""
+    if not has_role('staff'):
+        flash('Access denied. Only staff members can revoke sessions.', 'danger')
+        return redirect('/dashboard')
+
+    username = request.form.get('username', '').strip()
+    revoked = revoke_user_sessions(current_app, username)
+    if revoked is None:
+        flash('Session revocation requires a server-side session backend.', 'warning')
+    else:
+        flash(f'Revoked {revoked} session(s) for {username}.', 'success')
+    return redirect('/dashboard')
+
+
+@auth_bp.route('/api/metrics/login_throttle')
+@login_required
+def login_throttle_metrics():
+    """Counts of allowed and rejected login attempts."""
+    if not has_role('staff'):
+        return jsonify({'error': 'Access denied.'}), 403
+    return jsonify(login_throttle.stats())
@@ -0,0 +1,83 @@
+import threading
+import time
+
+
+class _Call:
+    """A computation in flight that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ReportCache:
+    """TTL result cache with single-flight coalescing.
+
+    Keys are tuples whose first element names the report, followed by its
+    normalized parameters. When several requests ask for the same key at
+    once, only the first runs ``compute``; the rest wait for its result.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}   # key -> (expires_at, value)
+        self._inflight = {}  # key -> _Call
+
+    def get_or_compute(self, key, compute, ttl):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = compute()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if call.error is None and ttl > 0:
+                    self._store(key, call.value, time.monotonic() + ttl)
+            call.done.set()
+        return call.value
+
+    def _store(self, key, value, expires_at):
+        if key not in self._entries and len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            expired = [k for k, (expiry, _) in self._entries.items() if expiry <= now]
+            for k in expired:
+                del self._entries[k]
+            if len(self._entries) >= self.max_entries:
+                del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+        self._entries[key] = (expires_at, value)
+
+    def invalidate(self, *prefix):
+        """Drop cached entries whose key starts with the given elements."""
+        size = len(prefix)
+        with self._lock:
+            for key in [key for key in self._entries if key[:size] == prefix]:
+                del self._entries[key]
+
+
+report_cache = ReportCache()
+
+
+def invalidate_user_tasks(*usernames):
+    """Drop cached task lists after a write to their orders or deliveries."""
+    for username in usernames:
+        if username:
+            report_cache.invalidate('user_tasks', username)
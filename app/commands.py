@@ -0,0 +1,92 @@
+import getpass
+import click
+from .jobs import enqueue, run_workers
+from .movements import bulk_move
+from .outbox import run_worker
+from .provisioning import read_users, provision_users
+from .recommend import recommendations
+from .utils import calibrate_bcrypt_rounds
+
+
+def register_commands(app):
+    """Attach the app's maintenance commands to the flask CLI."""
+
+    @app.cli.command('calibrate-bcrypt')
+    @click.option('--target-ms', type=float, default=None,
+                  help='Target hashing time in milliseconds (default: BCRYPT_TARGET_MS).')
+    def calibrate_bcrypt(target_ms):
+        """Measure bcrypt on this host and suggest a BCRYPT_ROUNDS value."""
+        target_ms = target_ms or app.config['BCRYPT_TARGET_MS']
+        rounds, timings = calibrate_bcrypt_rounds(target_ms)
+        for cost, elapsed in timings.items():
+            click.echo(f"cost {cost:2d}: {elapsed:8.1f} ms")
+        click.echo(f"Recommended BCRYPT_ROUNDS = {rounds} (target {target_ms:.0f} ms, "
+                   f"currently {app.config['BCRYPT_ROUNDS']}).")
+        click.echo("Existing passwords are rehashed at the new cost on their next login.")
+
+    @app.cli.command('provision-users')
+    @click.argument('csv_file', type=click.File('r'))
+    @click.option('--workers', type=int, default=None, help='Hashing processes (default: CPU count).')
+    def provision_users_command(csv_file, workers):
+        """Create users from a CSV of username,password,fname,lname,email,role."""
+        users, invalid = read_users(csv_file)
+        for line_number, reason in invalid:
+            click.echo(f"line {line_number}: {reason}", err=True)
+
+        report = provision_users(app.mysql.connection, users, app.config['BCRYPT_ROUNDS'], workers)
+        for username in report['skipped']:
+            click.echo(f"skipped existing user {username}", err=True)
+        click.echo(f"Created {report['created']} users in {report['seconds']}s "
+                   f"({report['usersPerSecond']} users/s, {report['hashSeconds']}s hashing).")
+        if report['failed']:
+            raise click.ClickException(f"Provisioning {report['failed']}")
+
+    @app.cli.command('outbox-worker')
+    def outbox_worker():
+        """Deliver queued notifications until interrupted."""
+        click.echo(f"Draining outbox with the '{app.config['OUTBOX_TRANSPORT']}' transport.")
+        run_worker(app)
+
+    @app.cli.command('job-worker')
+    @click.option('--threads', type=int, default=None, help='Worker threads (default: JOB_WORKER_THREADS).')
+    def job_worker(threads):
+        """Run queued background jobs until interrupted."""
+        click.echo(f"Running background jobs with {threads or app.config['JOB_WORKER_THREADS']} thread(s).")
+        run_workers(app, threads)
+
+    @app.cli.command('archive-orders')
+    @click.option('--days', type=int, default=None, help='Archive orders completed this many days ago (default: ARCHIVE_AFTER_DAYS).')
+    def archive_orders_command(days):
+        """Queue a job moving completed orders to the archive tables."""
+        with app.app_context():
+            job_id = enqueue('archive_orders', {'days': days})
+        click.echo(f"Queued archive job {job_id}; a job worker will run it.")
+
+    @app.cli.command('build-recommendations')
+    def build_recommendations():
+        """Rebuild the category co-occurrence index from all past orders."""
+        with app.app_context():
+            index = recommendations.rebuild(app.mysql.connection)
+        pairs = sum(len(row) for row in index.pairs.values()) // 2
+        click.echo(f"Indexed {len(index.orders)} categories and {pairs} co-occurring pairs "
+                   f"into {app.config['RECOMMEND_STATE_PATH']}.")
+
+    @app.cli.command('move-pieces')
+    @click.option('--from-room', type=int, required=True)
+    @click.option('--from-shelf', type=int, default=None, help='Only this shelf (default: the whole room).')
+    @click.option('--to-room', type=int, required=True)
+    @click.option('--to-shelf', type=int, required=True)
+    @click.option('--category', default=None, help='Only pieces of items in this main category.')
+    @click.option('--subcategory', default=None, help='With --category, only this subcategory.')
+    @click.option('--by', 'username', default=None, help='Name recorded in the movement log (default: OS user).')
+    def move_pieces_command(from_room, from_shelf, to_room, to_shelf, category, subcategory, username):
+        """Move every piece at a location to another one in a single transaction."""
+        with app.app_context():
+            try:
+                result = bulk_move(app.mysql.connection, from_room, to_room, to_shelf,
+                                   username or getpass.getuser(), from_shelf=from_shelf,
+                                   main_category=category, sub_category=subcategory)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+        click.echo(f"Moved {result['moved']} pieces to room {to_room}, shelf {to_shelf} "
+                   f"in {result['seconds']}s.")
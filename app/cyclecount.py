@@ -0,0 +1,287 @@
+import csv
+import heapq
+import os
+import tempfile
+import time
+from MySQLdb.cursors import SSDictCursor
+from flask import Blueprint, request, render_template, flash, redirect, session, send_file, abort, current_app
+from .jobs import enqueue, get_job, job_type
+from .movements import HOLDING_ROOM
+from .utils import login_required, parse_piece_code, has_role
+
+cyclecount_bp = Blueprint('cyclecount', __name__)
+
+
+def read_scans(lines, room_num, shelf_num):
+    """Yield (itemID, pieceNum, roomNum, shelfNum, code) for each scanned line.
+
+    A line is a piece code, optionally followed by the room and shelf it
+    was found on ('12:1,3,4'); otherwise the counted area is assumed, with
+    shelf None when a whole room or the warehouse is counted. Bare item
+    codes count as piece 1. Malformed codes are yielded with itemID None.
+    """
+    for row in csv.reader(lines):
+        if not row or not row[0].strip():
+            continue
+        code = row[0].strip()
+        parsed = parse_piece_code(code)
+        found_room, found_shelf = room_num, shelf_num
+        if len(row) >= 3 and row[1].strip().lstrip('-').isdigit() and row[2].strip().lstrip('-').isdigit():
+            found_room, found_shelf = int(row[1]), int(row[2])
+        if parsed is None:
+            yield None, None, found_room, found_shelf, code
+        else:
+            yield parsed[0], parsed[1] or 1, found_room, found_shelf, code
+
+
+def _piece_key(scan):
+    return scan[0], scan[1]
+
+
+def _sorted_runs(scans, run_size, directory):
+    """External sort, phase one: write sorted runs of at most run_size scans."""
+    runs, chunk = [], []
+
+    def flush():
+        chunk.sort(key=_piece_key)
+        run = tempfile.TemporaryFile('w+', newline='', dir=directory)
+        csv.writer(run).writerows(chunk)
+        run.seek(0)
+        runs.append(run)
+        chunk.clear()
+
+    for scan in scans:
+        chunk.append(scan)
+        if len(chunk) >= run_size:
+            flush()
+    if chunk:
+        flush()
+    return runs
+
+
+def _read_run(run):
+    for item_id, piece_num, room_num, shelf_num, code in csv.reader(run):
+        yield (int(item_id), int(piece_num), int(room_num) if room_num else None,
+               int(shelf_num) if shelf_num else None, code)
+
+
+def merged_scans(runs):
+    """External sort, phase two: merge the runs, dropping repeat scans of a piece."""
+    previous = None
+    for scan in heapq.merge(*(_read_run(run) for run in runs), key=_piece_key):
+        if scan[:2] != previous:
+            previous = scan[:2]
+            yield scan
+
+
+def area_condition(room_num, shelf_num):
+    if room_num is None:
+        # Whole warehouse: everything shelved, not the delivery holding area
+        return "roomNum <> %s", (HOLDING_ROOM,)
+    if shelf_num is None:
+        return "roomNum = %s", (room_num,)
+    return "roomNum = %s AND shelfNum = %s", (room_num, shelf_num)
+
+
+def reconcile(connection, scans, room_num, shelf_num, writer, run_size=50000, directory=None, batch_size=500):
+    """Compare scanned pieces with the database's view of an area.
+
+    Scans are sorted externally and merged, in primary key order, with an
+    unbuffered stream of the area's Piece rows, so memory stays bounded
+    whatever the size of the count:
+
+    - missing: in the area according to Piece but not scanned
+    - misplaced: scanned, but Piece has it on another shelf or room
+    - unexpected: the scanned code matches no piece, or is malformed
+
+    Rows are written to ``writer`` as (result, code, itemID, pieceNum,
+    foundRoom, foundShelf, recordedRoom, recordedShelf). Returns counts.
+    """
+    counts = {'matched': 0, 'missing': 0, 'misplaced': 0, 'unexpected': 0}
+
+    def scanned():
+        for scan in scans:
+            if scan[0] is None:
+                counts['unexpected'] += 1
+                writer.writerow(('unexpected', scan[4], '', '', scan[2], scan[3], '', ''))
+            else:
+                yield scan
+
+    def compare(scan, piece):
+        item_id, piece_num, found_room, found_shelf, code = scan
+        room, shelf = piece['roomNum'], piece['shelfNum']
+        if found_room is not None and (found_room != room or (found_shelf is not None and found_shelf != shelf)):
+            counts['misplaced'] += 1
+            writer.writerow(('misplaced', code, item_id, piece_num, found_room, found_shelf, room, shelf))
+        else:
+            counts['matched'] += 1
+
+    # Sort before the query starts, so the server-side result isn't held
+    # open while the scans are sorted. Scans not in the area are set aside
+    # (sorted, on disk) and looked up by key after the stream, since an
+    # unbuffered cursor owns the connection.
+    runs = _sorted_runs(scanned(), run_size, directory)
+    elsewhere = tempfile.TemporaryFile('w+', newline='', dir=directory)
+    try:
+        outside = csv.writer(elsewhere)
+        where, params = area_condition(room_num, shelf_num)
+        cursor = connection.cursor(SSDictCursor)
+        try:
+            cursor.execute(f"""
+                SELECT itemID, pieceNum, roomNum, shelfNum
+                FROM Piece
+                WHERE {where}
+                ORDER BY itemID, pieceNum
+            """, params)
+            pieces = iter(cursor)
+            piece = next(pieces, None)
+            for scan in merged_scans(runs):
+                while piece is not None and (piece['itemID'], piece['pieceNum']) < scan[:2]:
+                    counts['missing'] += 1
+                    writer.writerow(('missing', f"{piece['itemID']}:{piece['pieceNum']}", piece['itemID'],
+                                     piece['pieceNum'], '', '', piece['roomNum'], piece['shelfNum']))
+                    piece = next(pieces, None)
+                if piece is not None and (piece['itemID'], piece['pieceNum']) == scan[:2]:
+                    compare(scan, piece)
+                    piece = next(pieces, None)
+                else:
+                    outside.writerow(scan)
+            while piece is not None:
+                counts['missing'] += 1
+                writer.writerow(('missing', f"{piece['itemID']}:{piece['pieceNum']}", piece['itemID'],
+                                 piece['pieceNum'], '', '', piece['roomNum'], piece['shelfNum']))
+                piece = next(pieces, None)
+        finally:
+            cursor.close()
+
+        elsewhere.seek(0)
+        cursor = connection.cursor()
+        try:
+            scans_left = _read_run(elsewhere)
+            while True:
+                batch = [scan for _, scan in zip(range(batch_size), scans_left)]
+                if not batch:
+                    break
+                keys = ', '.join(['(%s, %s)'] * len(batch))
+                cursor.execute(f"""
+                    SELECT itemID, pieceNum, roomNum, shelfNum
+                    FROM Piece
+                    WHERE (itemID, pieceNum) IN ({keys})
+                """, tuple(value for scan in batch for value in scan[:2]))
+                recorded = {(row['itemID'], row['pieceNum']): row for row in cursor.fetchall()}
+                for scan in batch:
+                    piece = recorded.get(scan[:2])
+                    if piece is None:
+                        counts['unexpected'] += 1
+                        writer.writerow(('unexpected', scan[4], scan[0], scan[1], scan[2], scan[3], '', ''))
+                    else:
+                        counts['misplaced'] += 1
+                        writer.writerow(('misplaced', scan[4], scan[0], scan[1], scan[2], scan[3],
+                                         piece['roomNum'], piece['shelfNum']))
+        finally:
+            cursor.close()
+    finally:
+        elsewhere.close()
+        for run in runs:
+            run.close()
+    return counts
+
+
+def expire_reports(directory, max_age_seconds):
+    """Delete count reports, and scans left by failed uploads, older than max_age_seconds."""
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith(('cycle-count-', 'scans-')) and name.endswith('.csv') \
+                and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+@job_type('cycle_count')
+def cycle_count(job, payload):
+    """Job handler: reconcile an uploaded scan file and write a CSV report."""
+    room_num, shelf_num = payload.get('roomNum'), payload.get('shelfNum')
+    output_dir = current_app.config['CYCLE_COUNT_DIR']
+    report_path = os.path.abspath(os.path.join(output_dir, f"cycle-count-{job.job_id}.csv"))
+
+    try:
+        expire_reports(output_dir, current_app.config['CYCLE_COUNT_KEEP_DAYS'] * 86400)
+        job.progress(5, 'Sorting scans and comparing with recorded locations')
+        with open(payload['path'], newline='') as scan_file, open(report_path, 'w', newline='') as report:
+            writer = csv.writer(report)
+            writer.writerow(('result', 'code', 'itemID', 'pieceNum', 'foundRoom', 'foundShelf',
+                             'recordedRoom', 'recordedShelf'))
+            counts = reconcile(current_app.mysql.connection, read_scans(scan_file, room_num, shelf_num),
+                               room_num, shelf_num, writer, current_app.config['CYCLE_COUNT_RUN_SIZE'], output_dir)
+    finally:
+        if os.path.exists(payload['path']):
+            os.remove(payload['path'])
+    return {'path': report_path, **counts}
+
+
+@cyclecount_bp.route('/cycle_count', methods=['GET', 'POST'])
+@login_required
+def start_cycle_count():
+    """Upload the codes scanned on a shelf, in a room or across the warehouse."""
+    if not has_role('staff', 'volunteer'):
+        flash('Access denied. Only staff and volunteers can run inventory counts.', 'danger')
+        return redirect('/dashboard')
+
+    if request.method == 'POST':
+        room_num = request.form.get('roomNum', '').strip()
+        shelf_num = request.form.get('shelfNum', '').strip()
+        if any(value and not value.lstrip('-').isdigit() for value in (room_num, shelf_num)) \
+                or (shelf_num and not room_num):
+            flash('Error: Room and shelf must be numbers, and a shelf needs a room.', 'danger')
+            return redirect('/cycle_count')
+
+        upload = request.files.get('codesFile')
+        typed = request.form.get('codes', '')
+        if (upload is None or not upload.filename) and not typed.strip():
+            flash('Error: Upload a file of scanned codes or enter them below.', 'danger')
+            return redirect('/cycle_count')
+
+        output_dir = current_app.config['CYCLE_COUNT_DIR']
+        os.makedirs(output_dir, exist_ok=True)
+        handle, path = tempfile.mkstemp(prefix='scans-', suffix='.csv', dir=output_dir)
+        with os.fdopen(handle, 'wb') as scan_file:
+            if upload is not None and upload.filename:
+                upload.save(scan_file)
+            else:
+                scan_file.write(typed.replace('\r\n', '\n').encode())
+
+        try:
+            job_id = enqueue('cycle_count', {
+                'path': os.path.abspath(path),
+                'roomNum': int(room_num) if room_num else None,
+                'shelfNum': int(shelf_num) if shelf_num else None,
+            }, session['username'])
+        except Exception as e:
+            os.remove(path)
+            current_app.logger.error(f"Error in cycle_count: {e}")
+            flash(f"Error: {str(e)}", 'danger')
+            return redirect('/cycle_count')
+
+        flash('Reconciling the count in the background.', 'success')
+        return redirect(f'/cycle_count/{job_id}')
+
+    return render_template('cycle_count.html', job=None)
+
+
+@cyclecount_bp.route('/cycle_count/<int:job_id>')
+@login_required
+def cycle_count_result(job_id):
+    """Show a count's progress and totals, or download the full report."""
+    job = get_job(job_id)
+    if job is None or job['jobType'] != 'cycle_count' or not has_role('staff', 'volunteer'):
+        abort(404)
+
+    if job['status'] == 'done' and request.args.get('download'):
+        if not os.path.exists(job['result']['path']):
+            flash('This report has expired; run the count again.', 'danger')
+            return render_template('cycle_count.html', job=job)
+        return send_file(job['result']['path'], mimetype='text/csv',
+                         as_attachment=True, download_name=f"cycle-count-{job_id}.csv")
+    if job['status'] in ('failed', 'cancelled'):
+        flash(f"Inventory count failed: {job['message']}", 'danger')
+    return render_template('cycle_count.html', job=job)
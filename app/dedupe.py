@@ -0,0 +1,276 @@
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from flask import Blueprint, request, render_template, flash, redirect, session, current_app
+from .utils import login_required, has_role
+
+duplicates_bp = Blueprint('duplicates', __name__)
+
+_EMPTY = 1 << 32  # larger than any bin value
+
+
+def shingles(text, size=4):
+    """Character shingles of a description, normalized for case and spacing."""
+    text = ' '.join(re.findall(r'[a-z0-9]+', (text or '').lower()))
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHashIndex:
+    """Bounded MinHash/LSH index over recent donations.
+
+    Signatures use one-permutation MinHash: each description shingle is
+    hashed once into one of ``permutations`` bins and each bin keeps its
+    minimum, so signing costs one hash per shingle. Signatures are split
+    into ``bands`` of equal rows. Band buckets are keyed by the band
+    together with the item's exact attributes (donor, category, color,
+    material, dimensions), so only items that agree on all of those are
+    ever compared. A bucket keeps its ``bucket_size`` newest items, which
+    bounds the comparisons per insert even when one donor brings in a run
+    of near-identical things. The oldest item is evicted once ``capacity``
+    is reached.
+    """
+
+    def __init__(self, capacity=5000, permutations=64, bands=16, threshold=0.8, bucket_size=32):
+        self.capacity = capacity
+        self.bucket_size = bucket_size
+        self.bins = permutations
+        self.bands = bands
+        self.rows = permutations // bands
+        self.threshold = threshold
+        self.items = OrderedDict()   # itemID -> (attributes, signature)
+        self.buckets = {}            # (attributes, band, rows) -> [itemID, ...] oldest first
+        self._lock = threading.Lock()
+
+    def signature(self, text):
+        signature = [_EMPTY] * self.bins
+        for shingle in shingles(text):
+            value = zlib.crc32(shingle.encode())
+            slot, rank = value % self.bins, value // self.bins
+            if rank < signature[slot]:
+                signature[slot] = rank
+        return tuple(signature)
+
+    def _band_keys(self, attributes, signature):
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            # Short descriptions leave bins empty; all-empty bands would match everything
+            if any(value != _EMPTY for value in rows):
+                keys.append((attributes, band, rows))
+        return keys
+
+    def similarity(self, first, second):
+        """Estimated Jaccard similarity: agreeing bins over bins either item filled."""
+        filled = agree = 0
+        for x, y in zip(first, second):
+            if x != _EMPTY or y != _EMPTY:
+                filled += 1
+                agree += x == y
+        return agree / filled if filled else 1.0
+
+    def add(self, item_id, text, attributes, compare=True):
+        """Index an item and return [(itemID, similarity)] of likely duplicates."""
+        signature = self.signature(text)
+        keys = self._band_keys(attributes, signature)
+        with self._lock:
+            candidates = set()
+            for key in keys if compare else ():
+                candidates.update(self.buckets.get(key, ()))
+            matches = []
+            for candidate in candidates:
+                score = self.similarity(signature, self.items[candidate][1])
+                if score >= self.threshold:
+                    matches.append((candidate, score))
+
+            if item_id not in self.items:
+                self.items[item_id] = (attributes, signature)
+                for key in keys:
+                    bucket = self.buckets.setdefault(key, [])
+                    bucket.append(item_id)
+                    if len(bucket) > self.bucket_size:
+                        del bucket[0]
+                while len(self.items) > self.capacity:
+                    self._evict()
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def _evict(self):
+        item_id, (attributes, signature) = self.items.popitem(last=False)
+        for key in self._band_keys(attributes, signature):
+            bucket = self.buckets.get(key)
+            if bucket is not None and item_id in bucket:
+                bucket.remove(item_id)
+                if not bucket:
+                    del self.buckets[key]
+
+
+def donation_attributes(donor, main_category, sub_category, color, material, length, width, height):
+    normalize = lambda value: (value or '').strip().lower()
+    return (normalize(donor), main_category, sub_category, normalize(color), normalize(material),
+            tuple(sorted((int(length or 0), int(width or 0), int(height or 0)))))
+
+
+class DuplicateDetector:
+    """The app's MinHash index, seeded from recent donations on first use.
+
+    Donations accepted by other worker processes are picked up before each
+    check by loading the ones with a higher ItemID than any indexed yet.
+    """
+
+    RECENT_DONATIONS = """
+        SELECT i.ItemID, i.iDescription, i.mainCategory, i.subCategory, i.color, i.material,
+               d.userName, p.length, p.width, p.height
+        FROM Item i
+        JOIN DonatedBy d ON d.ItemID = i.ItemID
+        LEFT JOIN Piece p ON p.itemID = i.ItemID AND p.pieceNum = 1
+    """
+
+    def __init__(self):
+        self.index = None
+        self.last_item = 0
+        self._lock = threading.Lock()
+
+    def _index_rows(self, rows):
+        for row in rows:
+            self.index.add(row['ItemID'], row['iDescription'], donation_attributes(
+                row['userName'], row['mainCategory'], row['subCategory'], row['color'],
+                row['material'], row['length'], row['width'], row['height']), compare=False)
+            self.last_item = max(self.last_item, row['ItemID'])
+
+    def _ensure_seeded(self, connection, item_id):
+        if self.index is not None:
+            return
+        with self._lock:
+            if self.index is not None:
+                return
+            config = current_app.config
+            index = MinHashIndex(config['DEDUPE_CAPACITY'], config['DEDUPE_PERMUTATIONS'],
+                                 config['DEDUPE_BANDS'], config['DEDUPE_THRESHOLD'])
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"""
+                    SELECT * FROM ({self.RECENT_DONATIONS}
+                        WHERE i.ItemID <> %s
+                        ORDER BY i.ItemID DESC
+                        LIMIT %s
+                    ) recent
+                    ORDER BY ItemID
+                """, (item_id, index.capacity))
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+            self.index = index
+            self._index_rows(rows)
+
+    def _catch_up(self, connection, item_id):
+        """Index donations other processes accepted since the last look.
+
+        The donation being checked (item_id) is already committed, so it is
+        left out here and in the seed; check() indexes it with a comparison.
+        """
+        with self._lock:
+            since = self.last_item
+        cursor = connection.cursor()
+        try:
+            # A primary key range scan; usually a handful of rows
+            cursor.execute(f"""
+                {self.RECENT_DONATIONS}
+                WHERE i.ItemID > %s AND i.ItemID <> %s
+                ORDER BY i.ItemID
+                LIMIT %s
+            """, (since, item_id, self.index.capacity))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        with self._lock:
+            self._index_rows(rows)
+
+    def check(self, connection, item_id, description, attributes):
+        """Index a new donation and flag it if it looks like a recent one.
+
+        Never raises: a failure here is logged and intake carries on.
+        """
+        try:
+            self._ensure_seeded(connection, item_id)
+            self._catch_up(connection, item_id)
+            matches = self.index.add(item_id, description, attributes)
+            if not matches:
+                return []
+            cursor = connection.cursor()
+            try:
+                cursor.executemany("""
+                    INSERT IGNORE INTO DuplicateFlag (itemID, duplicateOf, similarity)
+                    VALUES (%s, %s, %s)
+                """, [(item_id, other, round(score, 3)) for other, score in matches])
+                connection.commit()
+            finally:
+                cursor.close()
+            return matches
+        except Exception as e:
+            current_app.logger.error(f"Duplicate check failed for item {item_id}: {e}")
+            return []
+
+
+detector = DuplicateDetector()
+
+
+@duplicates_bp.route('/duplicates', methods=['GET'])
+@login_required
+def review_duplicates():
+    """Donations flagged as possible duplicates of a recent one."""
+    if not has_role('staff'):
+        flash('Access denied. Only staff members can review duplicates.', 'danger')
+        return redirect('/dashboard')
+
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT f.flagID, f.similarity, f.createdAt,
+                   f.itemID, a.iDescription AS description, a.color, a.material,
+                   f.duplicateOf, b.iDescription AS duplicateDescription,
+                   da.userName AS donor, da.donateDate, db.donateDate AS duplicateDonateDate
+            FROM DuplicateFlag f
+            JOIN Item a ON a.ItemID = f.itemID
+            JOIN Item b ON b.ItemID = f.duplicateOf
+            LEFT JOIN DonatedBy da ON da.ItemID = f.itemID
+            LEFT JOIN DonatedBy db ON db.ItemID = f.duplicateOf
+            WHERE f.status = 'open'
+            ORDER BY f.createdAt DESC
+        """)
+        flags = cursor.fetchall()
+    finally:
+        cursor.close()
+    return render_template('duplicates.html', flags=flags)
+
+
+@duplicates_bp.route('/duplicates/<int:flag_id>', methods=['POST'])
+@login_required
+def resolve_duplicate(flag_id):
+    """Mark a flag as a confirmed duplicate or dismiss it."""
+    if not has_role('staff'):
+        flash('Access denied. Only staff members can review duplicates.', 'danger')
+        return redirect('/dashboard')
+
+    status = request.form.get('status', '').strip()
+    if status not in ('confirmed', 'dismissed'):
+        flash("Status must be 'confirmed' or 'dismissed'.", 'danger')
+        return redirect('/duplicates')
+
+    connection = current_app.mysql.connection
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            UPDATE DuplicateFlag
+            SET status = %s, reviewedBy = %s, reviewedAt = NOW()
+            WHERE flagID = %s AND status = 'open'
+        """, (status, session['username'], flag_id))
+        connection.commit()
+        if cursor.rowcount:
+            flash(f"Flag {flag_id} marked {status}.", 'success')
+        else:
+            flash(f"Flag {flag_id} not found or already reviewed.", 'danger')
+    finally:
+        cursor.close()
+    return redirect('/duplicates')
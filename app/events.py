@@ -0,0 +1,95 @@
+import json
+import queue
+import threading
+import time
+from flask import Blueprint, Response, jsonify, session, current_app, stream_with_context
+from .utils import login_required, has_role
+
+events_bp = Blueprint('events', __name__)
+
+
+class EventBus:
+    """In-process publish/subscribe for per-order events.
+
+    Each subscriber owns a bounded queue; a subscriber that falls behind
+    loses events rather than slowing down the publisher.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = {}  # channel -> set of queues
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, event, data):
+        """Deliver an event to every subscriber of a channel."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                pass
+        return len(subscribers)
+
+
+bus = EventBus()
+
+
+def publish_order_event(order_id, event, **data):
+    """Publish an order event (found, moved, prepared, ...) to its watchers."""
+    data['orderID'] = int(order_id)
+    data['time'] = time.time()
+    return bus.publish(('order', int(order_id)), event, data)
+
+
+@events_bp.route('/orders/<int:order_id>/events')
+@login_required
+def order_events(order_id):
+    """Server-sent events stream of picking and preparation events for an order.
+
+    Open to staff and volunteers, and to the client the order is for.
+    """
+    if not has_role('staff', 'volunteer'):
+        cursor = current_app.mysql.connection.cursor()
+        try:
+            cursor.execute("SELECT client FROM Ordered WHERE orderID = %s", (order_id,))
+            order = cursor.fetchone()
+        finally:
+            cursor.close()
+        if order is None or order['client'] != session['username']:
+            return jsonify({'error': 'Access denied.'}), 403
+
+    heartbeat = current_app.config['EVENT_HEARTBEAT_SECONDS']
+    channel = ('order', order_id)
+    subscriber = bus.subscribe(channel)
+
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        finally:
+            bus.unsubscribe(channel, subscriber)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,279 @@
+import json
+import threading
+import time
+from flask import Blueprint, jsonify, session, current_app
+from .utils import login_required, has_role
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# jobType -> (handler, max concurrent jobs of that type, discard callback)
+JOB_TYPES = {}
+
+CLAIM_LOCK = 'welcomehome_job_claim'
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled."""
+
+
+def job_type(name, concurrency=1, discard=None):
+    """Register a job handler: handler(job, payload) -> JSON-serializable result.
+
+    ``discard(payload)``, if given, is called when a job is cancelled before
+    it ran, to clean up anything the payload refers to.
+    """
+    def register(handler):
+        JOB_TYPES[name] = (handler, concurrency, discard)
+        return handler
+    return register
+
+
+class RunningJob:
+    """Handle passed to job handlers for reporting progress."""
+
+    def __init__(self, job_id, connection):
+        self.job_id = job_id
+        self.connection = connection
+
+    def progress(self, percent, message=None):
+        """Record progress and raise JobCancelled if cancellation was requested.
+
+        Commits the job's connection, so handlers should call it between
+        units of work they are happy to keep.
+        """
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("UPDATE Job SET progress = %s, message = %s WHERE jobID = %s",
+                           (int(percent), message, self.job_id))
+            cursor.execute("SELECT cancelRequested FROM Job WHERE jobID = %s", (self.job_id,))
+            cancelled = cursor.fetchone()['cancelRequested']
+            self.connection.commit()
+        finally:
+            cursor.close()
+        if cancelled:
+            raise JobCancelled()
+
+
+def enqueue(job_type_name, payload, created_by=None):
+    """Queue a job and return its ID. Commits immediately."""
+    if job_type_name not in JOB_TYPES:
+        raise ValueError(f"Unknown job type '{job_type_name}'.")
+    connection = current_app.mysql.connection
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO Job (jobType, payload, createdBy)
+            VALUES (%s, %s, %s)
+        """, (job_type_name, json.dumps(payload, default=str), created_by))
+        job_id = cursor.lastrowid
+        connection.commit()
+    finally:
+        cursor.close()
+    return job_id
+
+
+def get_job(job_id):
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT jobID, jobType, status, progress, message, result, createdBy,
+                   cancelRequested, createdAt, startedAt, finishedAt
+            FROM Job
+            WHERE jobID = %s
+        """, (job_id,))
+        job = cursor.fetchone()
+    finally:
+        cursor.close()
+    if job and job['result']:
+        job['result'] = json.loads(job['result'])
+    return job
+
+
+def claim_next(connection):
+    """Mark the oldest runnable queued job as running and return it, or None.
+
+    Claims are serialized with a MySQL named lock so per-type concurrency
+    limits hold across worker processes.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 5) AS acquired", (CLAIM_LOCK,))
+        if not cursor.fetchone()['acquired']:
+            return None
+        try:
+            cursor.execute("""
+                SELECT jobType, COUNT(*) AS running
+                FROM Job
+                WHERE status = 'running'
+                GROUP BY jobType
+            """)
+            running = {row['jobType']: row['running'] for row in cursor.fetchall()}
+            runnable = [name for name, (_, limit, _) in JOB_TYPES.items() if running.get(name, 0) < limit]
+            if not runnable:
+                return None
+
+            placeholders = ', '.join(['%s'] * len(runnable))
+            cursor.execute(f"""
+                SELECT jobID, jobType, payload
+                FROM Job
+                WHERE status = 'queued' AND jobType IN ({placeholders})
+                ORDER BY jobID
+                LIMIT 1
+            """, tuple(runnable))
+            job = cursor.fetchone()
+            if job:
+                # A cancel can land between the SELECT and here; only claim a job still queued
+                cursor.execute("""
+                    UPDATE Job SET status = 'running', startedAt = NOW()
+                    WHERE jobID = %s AND status = 'queued'
+                """, (job['jobID'],))
+                if not cursor.rowcount:
+                    job = None
+            connection.commit()
+            return job
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (CLAIM_LOCK,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _finish(connection, job_id, status, result=None, message=None):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            UPDATE Job
+            SET status = %s, result = %s, message = %s, finishedAt = NOW(),
+                progress = IF(%s = 'done', 100, progress)
+            WHERE jobID = %s
+        """, (status, json.dumps(result, default=str) if result is not None else None,
+              message, status, job_id))
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+def run_job(app, job):
+    """Run one claimed job and record its outcome."""
+    connection = app.mysql.connection
+    handler, _, _ = JOB_TYPES[job['jobType']]
+    try:
+        result = handler(RunningJob(job['jobID'], connection), json.loads(job['payload']))
+    except JobCancelled:
+        connection.rollback()
+        _finish(connection, job['jobID'], 'cancelled', message='Cancelled')
+    except Exception as e:
+        connection.rollback()
+        app.logger.error(f"Job {job['jobID']} ({job['jobType']}) failed: {e}")
+        _finish(connection, job['jobID'], 'failed', message=str(e)[:255])
+    else:
+        _finish(connection, job['jobID'], 'done', result=result)
+
+
+def requeue_stale(app):
+    """Put running jobs that stopped reporting progress back in the queue."""
+    with app.app_context():
+        connection = app.mysql.connection
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                UPDATE Job
+                SET status = 'queued', startedAt = NULL
+                WHERE status = 'running' AND updatedAt < NOW() - INTERVAL %s SECOND
+            """, (app.config['JOB_STALE_SECONDS'],))
+            connection.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+
+def _worker_loop(app, stop_event):
+    interval = app.config['JOB_POLL_SECONDS']
+    while not stop_event.is_set():
+        job = None
+        try:
+            with app.app_context():
+                job = claim_next(app.mysql.connection)
+                if job:
+                    run_job(app, job)
+        except Exception as e:
+            app.logger.error(f"Error in job worker: {e}")
+        if not job:
+            stop_event.wait(interval)
+
+
+def start_workers(app, threads=None, stop_event=None):
+    """Start worker threads in this process and return them."""
+    stop_event = stop_event or threading.Event()
+    requeue_stale(app)
+    workers = []
+    for number in range(threads or app.config['JOB_WORKER_THREADS']):
+        worker = threading.Thread(target=_worker_loop, args=(app, stop_event),
+                                  daemon=True, name=f'job-worker-{number}')
+        worker.start()
+        workers.append(worker)
+    return workers
+
+
+def run_workers(app, threads=None):
+    """Run worker threads until interrupted (used by `flask job-worker`)."""
+    stop_event = threading.Event()
+    workers = start_workers(app, threads, stop_event)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for worker in workers:
+            worker.join()
+
+
+def _can_view(job):
+    return job is not None and (has_role('staff') or job['createdBy'] == session['username'])
+
+
+@jobs_bp.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """Status, progress and result of a background job."""
+    job = get_job(job_id)
+    if not _can_view(job):
+        return jsonify({'error': f'No job found with ID {job_id}.'}), 404
+    return jsonify(job)
+
+
+@jobs_bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(job_id):
+    """Cancel a queued job, or ask a running one to stop at its next progress report."""
+    job = get_job(job_id)
+    if not _can_view(job):
+        return jsonify({'error': f'No job found with ID {job_id}.'}), 404
+
+    connection = current_app.mysql.connection
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            UPDATE Job
+            SET status = IF(status = 'queued', 'cancelled', status),
+                finishedAt = IF(status = 'cancelled', NOW(), finishedAt),
+                cancelRequested = TRUE
+            WHERE jobID = %s AND status IN ('queued', 'running')
+        """, (job_id,))
+        connection.commit()
+        changed = cursor.rowcount
+        cursor.execute("SELECT status, payload FROM Job WHERE jobID = %s", (job_id,))
+        cancelled = cursor.fetchone()
+    finally:
+        cursor.close()
+
+    if not changed:
+        return jsonify({'error': f"Job {job_id} has already finished."}), 409
+    # A job cancelled while queued never runs, so its handler can't clean up
+    _, _, discard = JOB_TYPES.get(job['jobType'], (None, None, None))
+    if discard and cancelled['status'] == 'cancelled':
+        try:
+            discard(json.loads(cancelled['payload']))
+        except Exception as e:
+            current_app.logger.error(f"Error discarding job {job_id}: {e}")
+    return jsonify(get_job(job_id))
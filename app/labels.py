@@ -0,0 +1,166 @@
+import importlib.util
+import os
+import time
+from flask import Blueprint, request, render_template, flash, redirect, session, current_app, send_file, abort
+from .jobs import enqueue, get_job, job_type
+from .utils import login_required, has_role
+
+labels_bp = Blueprint('labels', __name__)
+
+# Label sheet geometry (US Letter, 3 x 10 address-label layout), in points
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+LABEL_COLUMNS, LABEL_ROWS = 3, 10
+LABEL_WIDTH, LABEL_HEIGHT = 189, 72
+MARGIN_LEFT, MARGIN_TOP = 14, 36
+
+# reportlab is only needed for label sheets, so it stays an optional install
+REPORTLAB_MISSING = "Label sheets need the reportlab package (pip install reportlab)."
+
+LABEL_QUERY = """
+    SELECT p.itemID, p.pieceNum, i.iDescription, p.pDescription, p.roomNum, p.shelfNum
+    FROM Piece p
+    JOIN Item i ON p.itemID = i.itemID
+"""
+
+LABEL_SCOPES = {
+    'donation': "WHERE p.itemID = %s",
+    'order': "WHERE p.itemID IN (SELECT ItemID FROM ItemIn WHERE orderID = %s)",
+    'shelf': "WHERE p.roomNum = %s AND p.shelfNum = %s",
+}
+
+
+def reportlab_available():
+    return importlib.util.find_spec('reportlab') is not None
+
+
+def render_label_sheet(labels, path, on_page=None):
+    """Render label dicts to a PDF at path.
+
+    ``on_page(pages_done, pages)``, if given, is called after each page, so
+    a job can report progress (and be cancelled) between pages.
+    """
+    from reportlab.pdfgen import canvas
+    from reportlab.graphics.barcode.code128 import Code128
+
+    tmp_path = path + '.part'
+    pdf = canvas.Canvas(tmp_path, pagesize=(PAGE_WIDTH, PAGE_HEIGHT))
+    per_page = LABEL_COLUMNS * LABEL_ROWS
+    pages = -(-len(labels) // per_page)
+    for index, label in enumerate(labels):
+        if index and index % per_page == 0:
+            pdf.showPage()
+            if on_page:
+                on_page(index // per_page, pages)
+        slot = index % per_page
+        x = MARGIN_LEFT + (slot % LABEL_COLUMNS) * LABEL_WIDTH
+        y = PAGE_HEIGHT - MARGIN_TOP - (slot // LABEL_COLUMNS + 1) * LABEL_HEIGHT
+
+        code = f"{label['itemID']}:{label['pieceNum']}"
+        Code128(code, barHeight=28, barWidth=0.9).drawOn(pdf, x + 6, y + 36)
+        pdf.setFont('Helvetica-Bold', 8)
+        pdf.drawString(x + 8, y + 26, code)
+        pdf.setFont('Helvetica', 7)
+        description = label['pDescription'] or label['iDescription'] or ''
+        pdf.drawString(x + 8, y + 16, description[:45])
+        pdf.drawString(x + 8, y + 6, f"Room {label['roomNum']} / Shelf {label['shelfNum']}")
+    pdf.save()
+    os.replace(tmp_path, path)
+
+
+def expire_sheets(directory, max_age_seconds):
+    """Delete label sheets, and partial ones left by failed jobs, older than max_age_seconds."""
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith('labels-') and name.endswith(('.pdf', '.pdf.part')) \
+                and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+@job_type('labels', concurrency=2)
+def generate_labels(job, payload):
+    """Job handler: fetch the pieces for a scope and render them to a PDF."""
+    if not reportlab_available():
+        raise RuntimeError(REPORTLAB_MISSING)
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        cursor.execute(LABEL_QUERY + LABEL_SCOPES[payload['scope']] + " ORDER BY p.itemID, p.pieceNum",
+                       tuple(payload['params']))
+        pieces = list(cursor.fetchall())
+    finally:
+        cursor.close()
+    if not pieces:
+        raise ValueError('No pieces found for the selected scope.')
+
+    output_dir = current_app.config['LABEL_OUTPUT_DIR']
+    os.makedirs(output_dir, exist_ok=True)
+    expire_sheets(output_dir, current_app.config['LABEL_KEEP_DAYS'] * 86400)
+    job.progress(10, f"Rendering {len(pieces)} labels")
+    path = os.path.abspath(os.path.join(output_dir, f"labels-{job.job_id}.pdf"))
+    render_label_sheet(pieces, path, lambda done, pages: job.progress(10 + 90 * done // pages,
+                                                                      f"Rendered {done} of {pages} pages"))
+    return {'path': path, 'labels': len(pieces)}
+
+
+@labels_bp.route('/labels', methods=['GET', 'POST'])
+@login_required
+def labels():
+    """Generate a sheet of piece labels for a donation, an order or a shelf."""
+    if not has_role('staff'):
+        flash('Access denied. Only staff members can print labels.', 'danger')
+        return redirect('/dashboard')
+
+    if request.method == 'POST':
+        scope = request.form.get('scope', '').strip()
+        if scope == 'donation':
+            params = [request.form.get('itemID', '').strip()]
+        elif scope == 'order':
+            params = [request.form.get('orderID', '').strip()]
+        elif scope == 'shelf':
+            params = [request.form.get('roomNum', '').strip(), request.form.get('shelfNum', '').strip()]
+        else:
+            params = []
+
+        if not params or not all(param.lstrip('-').isdigit() for param in params):
+            flash('Error: Please choose a label scope and enter a valid number.', 'danger')
+            return redirect('/labels')
+
+        if not reportlab_available():
+            flash(f"Error: {REPORTLAB_MISSING}", 'danger')
+            return redirect('/labels')
+
+        try:
+            job_id = enqueue('labels', {'scope': scope, 'params': params}, session['username'])
+        except Exception as e:
+            current_app.logger.error(f"Error in labels: {e}")
+            flash(f"Error: {str(e)}", 'danger')
+            return redirect('/labels')
+
+        flash('Generating labels in the background.', 'success')
+        return redirect(f'/labels/{job_id}')
+
+    return render_template('labels.html', job_id=None, status=None)
+
+
+@labels_bp.route('/labels/<int:job_id>')
+@login_required
+def label_job(job_id):
+    """Show the status of a label job, or download the finished sheet."""
+    job = get_job(job_id)
+    if job is None or job['jobType'] != 'labels' or not has_role('staff'):
+        abort(404)
+
+    if job['status'] == 'done':
+        status = 'ready'
+        if request.args.get('download'):
+            if not os.path.exists(job['result']['path']):
+                flash('This label sheet has expired; print the labels again.', 'danger')
+                return render_template('labels.html', job_id=None, status=None)
+            return send_file(job['result']['path'], mimetype='application/pdf',
+                             as_attachment=True, download_name=f"labels-{job_id}.pdf")
+    elif job['status'] in ('failed', 'cancelled'):
+        status = 'failed'
+        flash(f"Label generation failed: {job['message']}", 'danger')
+    else:
+        status = 'pending'
+    return render_template('labels.html', job_id=job_id, status=status)
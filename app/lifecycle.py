@@ -0,0 +1,270 @@
+from flask import Blueprint, jsonify, request, session, current_app
+from .archive import ARCHIVED_TABLES
+from .cache import invalidate_user_tasks
+from .events import publish_order_event
+from .movements import HOLDING_ROOM, HOLDING_SHELF, move_pieces, after_move
+from .outbox import enqueue_notification
+from .utils import login_required, has_role
+
+orders_bp = Blueprint('orders', __name__)
+
+PICKED = 'Picked'
+PREPARED = 'Prepared'
+OUT_FOR_DELIVERY = 'Out for Delivery'
+DELIVERED = 'Delivered'
+
+# URL slug -> status stored in Delivered.status
+STATUSES = {
+    'picked': PICKED,
+    'prepared': PREPARED,
+    'out_for_delivery': OUT_FOR_DELIVERY,
+    'delivered': DELIVERED,
+}
+
+# Current status (None: no Delivered row yet) -> statuses it may move to
+TRANSITIONS = {
+    None: {PICKED, PREPARED},
+    PICKED: {PREPARED},
+    PREPARED: {OUT_FOR_DELIVERY},
+    OUT_FOR_DELIVERY: {DELIVERED, PREPARED},  # back to Prepared if a delivery fails
+    DELIVERED: set(),
+}
+
+
+class TransitionError(Exception):
+    """Raised when an order cannot move to the requested status."""
+
+
+def current_status(order_column, include_archive=False):
+    """SQL expression for an order's current status, NULL before it has a Delivered row.
+
+    An order can have several Delivered rows (one per assigned user); the
+    most recent one wins. The subquery is correlated on ``order_column``, so
+    each outer row is one lookup on the delivered_order_date index. An
+    archived order has all its rows in DeliveredArchive, so with
+    include_archive the archive is only consulted when Delivered has none.
+    """
+    tables = [cold for hot, cold, _ in ARCHIVED_TABLES if hot == 'Delivered'] if include_archive else []
+    lookups = [f"""(SELECT status FROM {table} current
+                     WHERE current.orderID = {order_column}
+                     ORDER BY current.date DESC, current.userName
+                     LIMIT 1)""" for table in ['Delivered', *tables]]
+    return lookups[0] if len(lookups) == 1 else f"COALESCE({', '.join(lookups)})"
+
+
+def current_statuses(cursor, order_ids, lock=False):
+    """Map each existing order ID to its current status (None if not yet in Delivered)."""
+    placeholders = ', '.join(['%s'] * len(order_ids))
+    cursor.execute(f"""
+        SELECT orderID, client, supervisor, NULL AS status, NULL AS userName
+        FROM Ordered
+        WHERE orderID IN ({placeholders})
+        {'FOR UPDATE' if lock else ''}
+    """, tuple(order_ids))
+    orders = {row['orderID']: row for row in cursor.fetchall()}
+    # The most recent Delivered row wins when an order has several
+    cursor.execute(f"""
+        SELECT orderID, status, userName
+        FROM Delivered
+        WHERE orderID IN ({placeholders})
+        ORDER BY orderID, date, userName DESC
+        {'FOR UPDATE' if lock else ''}
+    """, tuple(order_ids))
+    for row in cursor.fetchall():
+        if row['orderID'] in orders:
+            orders[row['orderID']].update(status=row['status'], userName=row['userName'])
+    return orders
+
+
+def transition_orders(cursor, order_ids, status, username):
+    """Move orders to a new status within the caller's transaction.
+
+    Orders that don't exist or can't make the transition are left alone and
+    returned in ``rejected`` with a reason. Orders moving to Prepared also
+    have their pieces moved to the holding location, and their client is
+    notified the first time. The caller commits, then calls
+    after_transition() with the result.
+    """
+    if status not in TRANSITIONS:
+        raise TransitionError(f"Unknown status '{status}'.")
+    order_ids = sorted({int(order_id) for order_id in order_ids})
+    if not order_ids:
+        return {'status': status, 'changed': [], 'rejected': {}, 'orders': {}, 'moved': {}}
+
+    orders = current_statuses(cursor, order_ids, lock=True)
+    changed, rejected = [], {}
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if order is None:
+            rejected[order_id] = 'order not found'
+        elif status not in TRANSITIONS[order['status']]:
+            rejected[order_id] = f"cannot move from {order['status'] or 'Open'} to {status}"
+        else:
+            changed.append(order_id)
+
+    new_orders = [order_id for order_id in changed if orders[order_id]['status'] is None]
+    existing = [order_id for order_id in changed if orders[order_id]['status'] is not None]
+    if new_orders:
+        cursor.executemany("""
+            INSERT INTO Delivered (userName, orderID, status, date)
+            VALUES (%s, %s, %s, CURRENT_DATE())
+        """, [(username, order_id, status) for order_id in new_orders])
+    if existing:
+        placeholders = ', '.join(['%s'] * len(existing))
+        cursor.execute(f"""
+            UPDATE Delivered
+            SET status = %s, date = CURRENT_DATE()
+            WHERE orderID IN ({placeholders})
+        """, (status, *existing))
+    if changed:
+        cursor.executemany("""
+            INSERT INTO OrderStatusLog (orderID, status, changedBy)
+            VALUES (%s, %s, %s)
+        """, [(order_id, status, username) for order_id in changed])
+
+    moved = {}
+    if status == PREPARED:
+        for order_id in changed:
+            moved[order_id] = move_pieces(cursor, "itemID IN (SELECT ItemID FROM ItemIn WHERE orderID = %s)",
+                                          (order_id,), HOLDING_ROOM, HOLDING_SHELF, username,
+                                          f"prepared order {order_id}")
+            if orders[order_id]['status'] in (None, PICKED):
+                enqueue_notification(cursor, 'order_prepared', orders[order_id]['client'], orderID=order_id)
+
+    return {
+        'status': status,
+        'changed': changed,
+        'rejected': rejected,
+        'orders': {order_id: orders[order_id] for order_id in changed},
+        'moved': moved,
+    }
+
+
+def after_transition(result, username):
+    """Update caches and watchers once a transition is committed."""
+    status = result['status']
+    for order_id, order in result['orders'].items():
+        invalidate_user_tasks(order['client'], order['supervisor'], order['userName'], username)
+        if order_id in result['moved']:
+            after_move([order_id], HOLDING_ROOM, HOLDING_SHELF, username, pieces=result['moved'][order_id])
+        publish_order_event(order_id, 'status', status=status, previous=order['status'], by=username)
+
+
+def can_transition(status=None):
+    """Staff and volunteers move orders along; only staff prepare them."""
+    if status == PREPARED:
+        return has_role('staff')
+    return has_role('staff', 'volunteer')
+
+
+def _requested_status(payload):
+    """The status named in a JSON or form payload, or None if it isn't a known one."""
+    status = payload.get('status') if isinstance(payload, dict) else None
+    return STATUSES.get(status.strip().lower()) if isinstance(status, str) else None
+
+
+def _apply(order_ids, status):
+    connection = current_app.mysql.connection
+    cursor = connection.cursor()
+    try:
+        result = transition_orders(cursor, order_ids, status, session['username'])
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    after_transition(result, session['username'])
+    return {'status': status, 'changed': result['changed'],
+            'rejected': {str(order_id): reason for order_id, reason in result['rejected'].items()}}
+
+
+@orders_bp.route('/orders/<int:order_id>/status', methods=['POST'])
+@login_required
+def set_order_status(order_id):
+    """Move one order to the next stage of its lifecycle."""
+    if not can_transition():
+        return jsonify({'error': 'Access denied.'}), 403
+    status = _requested_status(request.get_json(silent=True) or request.form)
+    if status is None:
+        return jsonify({'error': f"Status must be one of: {', '.join(STATUSES)}."}), 400
+    if not can_transition(status):
+        return jsonify({'error': 'Access denied. Only staff members can prepare orders.'}), 403
+
+    result = _apply([order_id], status)
+    if result['rejected']:
+        return jsonify({'error': result['rejected'][str(order_id)], **result}), 409
+    return jsonify(result)
+
+
+@orders_bp.route('/orders/status', methods=['POST'])
+@login_required
+def bulk_order_status():
+    """Move a whole delivery run of orders to one status in a single transaction."""
+    if not can_transition():
+        return jsonify({'error': 'Access denied.'}), 403
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object with status and orderIDs.'}), 400
+    status = _requested_status(payload)
+    order_ids = payload.get('orderIDs')
+    if status is None:
+        return jsonify({'error': f"Status must be one of: {', '.join(STATUSES)}."}), 400
+    if not isinstance(order_ids, list) or not order_ids or not all(str(o).isdigit() for o in order_ids):
+        return jsonify({'error': 'orderIDs must be a non-empty list of order IDs.'}), 400
+    if not can_transition(status):
+        return jsonify({'error': 'Access denied. Only staff members can prepare orders.'}), 403
+
+    return jsonify(_apply(order_ids, status))
+
+
+@orders_bp.route('/orders/queue/<slug>')
+@login_required
+def order_queue(slug):
+    """Orders currently in one lifecycle stage, oldest first."""
+    if not can_transition():
+        return jsonify({'error': 'Access denied.'}), 403
+    status = STATUSES.get(slug)
+    if status is None:
+        return jsonify({'error': f"Queue must be one of: {', '.join(STATUSES)}."}), 404
+
+    limit = request.args.get('limit', '50')
+    offset = request.args.get('offset', '0')
+    if not limit.isdigit() or not offset.isdigit():
+        return jsonify({'error': 'Limit and offset must be numbers.'}), 400
+
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        # Served by the delivered_status_date index
+        cursor.execute("""
+            SELECT d.orderID, d.userName, d.status, d.date, o.client, o.supervisor, o.orderDate
+            FROM Delivered d
+            JOIN Ordered o ON o.orderID = d.orderID
+            WHERE d.status = %s
+            ORDER BY d.date, d.orderID
+            LIMIT %s OFFSET %s
+        """, (status, min(int(limit), 500), int(offset)))
+        orders = cursor.fetchall()
+    finally:
+        cursor.close()
+    return jsonify({'status': status, 'orders': orders})
+
+
+@orders_bp.route('/orders/<int:order_id>/history')
+@login_required
+def order_history(order_id):
+    """When an order entered each stage, and who moved it."""
+    if not can_transition():
+        return jsonify({'error': 'Access denied.'}), 403
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT status, changedBy, changedAt
+            FROM OrderStatusLog
+            WHERE orderID = %s
+            ORDER BY changedAt, logID
+        """, (order_id,))
+        history = cursor.fetchall()
+    finally:
+        cursor.close()
+    return jsonify({'orderID': order_id, 'history': history})
@@ -0,0 +1,167 @@
+from itertools import permutations
+
+
+def orientations(length, width, height):
+    """Distinct (width, depth, height) placements of a box, lowest first."""
+    return sorted(set(permutations((length, width, height))), key=lambda box: (box[2], box[1], box[0]))
+
+
+class Trip:
+    """One vehicle load, packed in horizontal layers of front-to-back shelves.
+
+    Each layer is as tall as the first piece laid in it and is divided into
+    shelves across the cargo width. A piece goes into the first shelf with
+    room, then a new shelf in the first layer with length to spare, then a
+    new layer on top.
+    """
+
+    def __init__(self, vehicle):
+        self.vehicle = vehicle
+        self.width = vehicle['width']
+        self.length = vehicle['length']
+        self.height = vehicle['height']
+        self.layers = []        # [z, height, [[y, depth, x_used], ...]]
+        self.top = 0
+        self.placements = []
+        self.orders = []
+        self.volume = 0
+
+    def _fit(self, dims, layer):
+        _, headroom, shelves = layer
+        for shelf in shelves:
+            for w, d, h in dims:
+                if h <= headroom and d <= shelf[1] and shelf[2] + w <= self.width:
+                    return shelf, shelf[2], w, d, h
+        y_used = shelves[-1][0] + shelves[-1][1]
+        for w, d, h in dims:
+            if h <= headroom and w <= self.width and y_used + d <= self.length:
+                shelf = [y_used, d, 0]
+                shelves.append(shelf)
+                return shelf, 0, w, d, h
+        return None
+
+    def _place(self, piece):
+        dims = orientations(piece['length'], piece['width'], piece['height'])
+        for index, layer in enumerate(self.layers):
+            spot = self._fit(dims, layer)
+            if spot:
+                return self._put(piece, index, *spot)
+        for w, d, h in dims:
+            if w <= self.width and d <= self.length and self.top + h <= self.height:
+                shelf = [0, d, 0]
+                self.layers.append([self.top, h, [shelf]])
+                self.top += h
+                return self._put(piece, len(self.layers) - 1, shelf, 0, w, d, h)
+        return False
+
+    def _put(self, piece, index, shelf, x, w, d, h):
+        layer = self.layers[index]
+        shelf[2] += w
+        self.volume += w * d * h
+        self.placements.append({
+            'orderID': piece['orderID'], 'itemID': piece['itemID'], 'pieceNum': piece['pieceNum'],
+            'x': x, 'y': shelf[0], 'z': layer[0], 'width': w, 'depth': d, 'height': h,
+        })
+        return True
+
+    def add_order(self, order_id, pieces):
+        """Place all of an order's pieces, or none of them."""
+        saved = ([[z, h, [list(shelf) for shelf in shelves]] for z, h, shelves in self.layers],
+                 self.top, len(self.placements), self.volume)
+        for piece in pieces:
+            if not self._place(piece):
+                self.layers, self.top, count, self.volume = saved
+                del self.placements[count:]
+                return False
+        self.orders.append(order_id)
+        return True
+
+    def add_piece(self, piece):
+        if not self._place(piece):
+            return False
+        if piece['orderID'] not in self.orders:
+            self.orders.append(piece['orderID'])
+        return True
+
+    def to_dict(self):
+        capacity = self.width * self.length * self.height
+        return {
+            'vehicle': self.vehicle['name'],
+            'orders': self.orders,
+            'pieces': self.placements,
+            'fill': round(self.volume / capacity, 3) if capacity else 0,
+        }
+
+
+def plan_loads(pieces, vehicles):
+    """Pack the pieces of a set of orders into trips of the given vehicles.
+
+    pieces: dicts with orderID, itemID, pieceNum, length, width, height.
+    vehicles: dicts with name and cargo length, width and height.
+
+    Orders are packed whole, largest first, into the first open trip with
+    room (first-fit decreasing), so one household's pieces stay together.
+    A new trip goes to the vehicle with the fewest trips so far that can
+    hold the order. An order that won't fit in an empty vehicle is spread
+    over trips of its own and reported in ``split``; pieces too big for
+    every vehicle are returned in ``unplaced``.
+    """
+    orders = {}
+    for piece in pieces:
+        orders.setdefault(piece['orderID'], []).append(piece)
+    for order_pieces in orders.values():
+        # Tallest lying height first so later pieces fit under each layer
+        order_pieces.sort(key=lambda p: (min(p['length'], p['width'], p['height']),
+                                         p['length'] * p['width'] * p['height']), reverse=True)
+
+    def fits_any(piece):
+        return any(all(a <= b for a, b in zip(sorted((piece['length'], piece['width'], piece['height'])),
+                                              sorted((v['length'], v['width'], v['height']))))
+                   for v in vehicles)
+
+    trip_counts = {vehicle['name']: 0 for vehicle in vehicles}
+    # Roomiest vehicles first when trip counts tie
+    by_size = sorted(vehicles, key=lambda v: v['length'] * v['width'] * v['height'], reverse=True)
+    trips, split, unplaced = [], [], []
+
+    def new_trip(order_id, order_pieces):
+        for vehicle in sorted(by_size, key=lambda v: trip_counts[v['name']]):
+            trip = Trip(vehicle)
+            if trip.add_order(order_id, order_pieces):
+                trip_counts[vehicle['name']] += 1
+                trips.append(trip)
+                return True
+        return False
+
+    def order_volume(order_id):
+        return sum(p['length'] * p['width'] * p['height'] for p in orders[order_id])
+
+    for order_id in sorted(orders, key=order_volume, reverse=True):
+        order_pieces = [p for p in orders[order_id] if fits_any(p)]
+        unplaced.extend({'orderID': p['orderID'], 'itemID': p['itemID'], 'pieceNum': p['pieceNum']}
+                        for p in orders[order_id] if not fits_any(p))
+        if not order_pieces or any(trip.add_order(order_id, order_pieces) for trip in trips):
+            continue
+        if new_trip(order_id, order_pieces):
+            continue
+
+        # Larger than one load: give it dedicated trips on the biggest vehicle
+        split.append(order_id)
+        trip = None
+        for piece in order_pieces:
+            if trip is not None and trip.add_piece(piece):
+                continue
+            trip = Trip(by_size[0])
+            if trip.add_piece(piece):
+                trip_counts[by_size[0]['name']] += 1
+                trips.append(trip)
+            else:
+                unplaced.append({'orderID': order_id, 'itemID': piece['itemID'],
+                                 'pieceNum': piece['pieceNum']})
+                trip = None
+
+    plan = {vehicle['name']: [] for vehicle in vehicles}
+    for trip in trips:
+        if trip.placements:
+            plan[trip.vehicle['name']].append(trip.to_dict())
+    return {'vehicles': plan, 'split': split, 'unplaced': unplaced}
@@ -0,0 +1,227 @@
+import threading
+import time
+from flask import Blueprint, request, render_template, flash, redirect, current_app
+from .utils import login_required, has_role
+
+locations_bp = Blueprint('locations', __name__)
+
+PAGE_SIZE = 50
+
+
+class LocationSummaries:
+    """Piece count, volume and category mix for every shelf.
+
+    Seeded with one aggregate query, then brought up to date on each read
+    from the PieceMovement log: every shelving and move, from any process
+    (including `flask move-pieces`), appends a row there, so replaying the
+    rows after the last one seen keeps the summaries current without
+    aggregating Piece. A full re-seed every ``reseed_seconds`` is only a
+    backstop for log rows that committed out of ID order.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seeded_at = None
+        self.last_movement = 0
+        self.shelves = {}   # (roomNum, shelfNum) -> {'pieces', 'volume', 'categories'}
+
+    def seed(self, connection):
+        """Load every summary; commits, to read the tables and log from one snapshot."""
+        cursor = connection.cursor()
+        try:
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+            cursor.execute("SELECT COALESCE(MAX(movementID), 0) AS lastMovement FROM PieceMovement")
+            last_movement = cursor.fetchone()['lastMovement']
+            cursor.execute("SELECT roomNum, shelfNum FROM Location")
+            shelves = {(row['roomNum'], row['shelfNum']): self._empty() for row in cursor.fetchall()}
+            cursor.execute("""
+                SELECT p.roomNum, p.shelfNum, i.mainCategory,
+                       COUNT(*) AS pieces, COALESCE(SUM(p.length * p.width * p.height), 0) AS volume
+                FROM Piece p
+                JOIN Item i ON i.ItemID = p.itemID
+                WHERE p.roomNum IS NOT NULL
+                GROUP BY p.roomNum, p.shelfNum, i.mainCategory
+            """)
+            for row in cursor.fetchall():
+                summary = shelves.setdefault((row['roomNum'], row['shelfNum']), self._empty())
+                self._apply(summary, row['mainCategory'], row['pieces'], int(row['volume']))
+            connection.commit()
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self.shelves = shelves
+            self.last_movement = last_movement
+            self.seeded_at = time.monotonic()
+
+    def catch_up(self, connection):
+        """Apply PieceMovement rows logged since the last seed or catch-up."""
+        with self._lock:
+            since = self.last_movement
+        cursor = connection.cursor()
+        try:
+            # A primary key range scan; usually empty
+            cursor.execute("""
+                SELECT m.fromRoom, m.fromShelf, m.toRoom, m.toShelf, i.mainCategory,
+                       COUNT(*) AS pieces, COALESCE(SUM(p.length * p.width * p.height), 0) AS volume,
+                       MAX(m.movementID) AS lastMovement
+                FROM PieceMovement m
+                JOIN Piece p ON p.itemID = m.itemID AND p.pieceNum = m.pieceNum
+                JOIN Item i ON i.ItemID = m.itemID
+                WHERE m.movementID > %s
+                GROUP BY m.fromRoom, m.fromShelf, m.toRoom, m.toShelf, i.mainCategory
+            """, (since,))
+            moves = cursor.fetchall()
+        finally:
+            cursor.close()
+        if not moves:
+            return
+
+        with self._lock:
+            # Another thread (or a re-seed) got here first
+            if self.last_movement != since:
+                return
+            for move in moves:
+                pieces, volume = move['pieces'], int(move['volume'])
+                if move['fromRoom'] is not None:
+                    self._adjust(move['fromRoom'], move['fromShelf'], move['mainCategory'], -pieces, -volume)
+                self._adjust(move['toRoom'], move['toShelf'], move['mainCategory'], pieces, volume)
+            self.last_movement = max(move['lastMovement'] for move in moves)
+
+    def ensure_current(self, connection, reseed_seconds):
+        if self.seeded_at is None or time.monotonic() - self.seeded_at > reseed_seconds:
+            self.seed(connection)
+        else:
+            self.catch_up(connection)
+
+    @staticmethod
+    def _empty():
+        return {'pieces': 0, 'volume': 0, 'categories': {}}
+
+    @staticmethod
+    def _apply(summary, main_category, pieces, volume):
+        summary['pieces'] += pieces
+        summary['volume'] += volume
+        categories = summary['categories']
+        categories[main_category] = categories.get(main_category, 0) + pieces
+        if categories[main_category] <= 0:
+            del categories[main_category]
+
+    def _adjust(self, room_num, shelf_num, main_category, pieces, volume):
+        summary = self.shelves.setdefault((room_num, shelf_num), self._empty())
+        self._apply(summary, main_category, pieces, volume)
+
+    def rooms(self):
+        """Per-room totals, summed from the shelf summaries."""
+        with self._lock:
+            rooms = {}
+            for (room_num, _), summary in self.shelves.items():
+                room = rooms.setdefault(room_num, {'roomNum': room_num, 'shelves': 0, **self._empty()})
+                room['shelves'] += 1
+                self._merge(room, summary)
+        return [self._ranked(rooms[room_num]) for room_num in sorted(rooms)]
+
+    def room(self, room_num):
+        with self._lock:
+            shelves = [self._ranked({'roomNum': room, 'shelfNum': shelf, **self._copy(summary)})
+                       for (room, shelf), summary in self.shelves.items() if room == room_num]
+        return sorted(shelves, key=lambda shelf: shelf['shelfNum'])
+
+    def shelf(self, room_num, shelf_num):
+        with self._lock:
+            summary = self.shelves.get((room_num, shelf_num))
+            return self._ranked(self._copy(summary)) if summary is not None else None
+
+    @staticmethod
+    def _merge(total, summary):
+        total['pieces'] += summary['pieces']
+        total['volume'] += summary['volume']
+        for category, count in summary['categories'].items():
+            total['categories'][category] = total['categories'].get(category, 0) + count
+
+    @staticmethod
+    def _copy(summary):
+        return {'pieces': summary['pieces'], 'volume': summary['volume'],
+                'categories': dict(summary['categories'])}
+
+    @staticmethod
+    def _ranked(summary):
+        summary['categories'] = sorted(summary['categories'].items(), key=lambda entry: (-entry[1], str(entry[0])))
+        return summary
+
+
+location_summaries = LocationSummaries()
+
+
+def _current():
+    location_summaries.ensure_current(current_app.mysql.connection, current_app.config['LOCATION_RESEED_SECONDS'])
+
+
+@locations_bp.route('/locations')
+@login_required
+def room_overview():
+    """Every room with its piece count, volume and category mix."""
+    if not has_role('staff', 'volunteer'):
+        flash('Access denied. Only staff and volunteers can browse locations.', 'danger')
+        return redirect('/dashboard')
+    _current()
+    return render_template('locations.html', rooms=location_summaries.rooms(), room_num=None)
+
+
+@locations_bp.route('/locations/<int(signed=True):room_num>')
+@login_required
+def room_shelves(room_num):
+    """The shelves of one room with their summaries."""
+    if not has_role('staff', 'volunteer'):
+        flash('Access denied. Only staff and volunteers can browse locations.', 'danger')
+        return redirect('/dashboard')
+    _current()
+    shelves = location_summaries.room(room_num)
+    if not shelves:
+        flash(f"No shelves found in room {room_num}.", 'warning')
+        return redirect('/locations')
+    return render_template('locations.html', shelves=shelves, room_num=room_num)
+
+
+@locations_bp.route('/locations/<int(signed=True):room_num>/<int(signed=True):shelf_num>')
+@login_required
+def shelf_contents(room_num, shelf_num):
+    """The pieces on one shelf, a page at a time.
+
+    Pages are keyed on (itemID, pieceNum) via ``after`` rather than an
+    offset, so deep pages cost the same as the first one.
+    """
+    if not has_role('staff', 'volunteer'):
+        flash('Access denied. Only staff and volunteers can browse locations.', 'danger')
+        return redirect('/dashboard')
+
+    after = request.args.get('after', '0:0').strip()
+    item_part, _, piece_part = after.partition(':')
+    if not item_part.isdigit() or not piece_part.isdigit():
+        flash('Invalid page.', 'danger')
+        return redirect(f'/locations/{room_num}/{shelf_num}')
+
+    _current()
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        # Served by the piece_location index on (roomNum, shelfNum, itemID, pieceNum)
+        cursor.execute("""
+            SELECT p.itemID, p.pieceNum, p.pDescription, p.length, p.width, p.height, p.pNotes,
+                   i.iDescription, i.mainCategory, i.subCategory, i.color, i.material
+            FROM Piece p
+            JOIN Item i ON i.ItemID = p.itemID
+            WHERE p.roomNum = %s AND p.shelfNum = %s AND (p.itemID, p.pieceNum) > (%s, %s)
+            ORDER BY p.itemID, p.pieceNum
+            LIMIT %s
+        """, (room_num, shelf_num, int(item_part), int(piece_part), PAGE_SIZE + 1))
+        pieces = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    next_page = None
+    if len(pieces) > PAGE_SIZE:
+        pieces = pieces[:PAGE_SIZE]
+        next_page = f"{pieces[-1]['itemID']}:{pieces[-1]['pieceNum']}"
+    return render_template('locations.html', room_num=room_num, shelf_num=shelf_num,
+                           summary=location_summaries.shelf(room_num, shelf_num),
+                           pieces=pieces, next_page=next_page)
@@ -0,0 +1,228 @@
+import time
+from flask import Blueprint, jsonify, request, render_template, flash, redirect, session, current_app
+from .events import publish_order_event
+from .utils import login_required, has_role
+
+movements_bp = Blueprint('movements', __name__)
+
+# Where prepared orders wait for delivery
+HOLDING_ROOM = -1
+HOLDING_SHELF = -1
+
+
+def record_placement(cursor, item_id, piece_num, room_num, shelf_num, username, reason):
+    """Log where a new piece was first shelved; call with the Piece insert."""
+    cursor.execute("""
+        INSERT INTO PieceMovement (itemID, pieceNum, fromRoom, fromShelf, toRoom, toShelf, movedBy, reason)
+        VALUES (%s, %s, NULL, NULL, %s, %s, %s, %s)
+    """, (item_id, piece_num, room_num, shelf_num, username, reason))
+
+
+def move_pieces(cursor, where, params, room_num, shelf_num, username, reason):
+    """Move every Piece matching ``where`` to a new location.
+
+    Runs in the caller's transaction as two set-based statements: an
+    INSERT ... SELECT appending one PieceMovement row per piece that is
+    actually changing place (including pieces with no recorded location),
+    then the UPDATE of Piece, which remains the current-location
+    projection. ``where`` is an SQL condition on Piece (without the WHERE
+    keyword) and ``params`` its parameters. Returns the number of pieces
+    moved.
+    """
+    params = tuple(params)
+    cursor.execute(f"""
+        INSERT INTO PieceMovement (itemID, pieceNum, fromRoom, fromShelf, toRoom, toShelf, movedBy, reason)
+        SELECT itemID, pieceNum, roomNum, shelfNum, %s, %s, %s, %s
+        FROM Piece
+        WHERE ({where}) AND NOT (roomNum <=> %s AND shelfNum <=> %s)
+    """, (room_num, shelf_num, username, reason, *params, room_num, shelf_num))
+    cursor.execute(f"""
+        UPDATE Piece
+        SET roomNum = %s, shelfNum = %s
+        WHERE ({where}) AND NOT (roomNum <=> %s AND shelfNum <=> %s)
+    """, (room_num, shelf_num, *params, room_num, shelf_num))
+    return cursor.rowcount
+
+
+def after_move(order_ids, room_num, shelf_num, username, **details):
+    """Tell the watchers of the affected orders once a move is committed."""
+    for order_id in order_ids:
+        publish_order_event(order_id, 'moved', roomNum=room_num, shelfNum=shelf_num, by=username, **details)
+
+
+def bulk_move(connection, from_room, to_room, to_shelf, username, from_shelf=None,
+              main_category=None, sub_category=None, item_ids=None):
+    """Move all pieces at a location, or the matching subset, in one transaction.
+
+    Leaving out ``from_shelf`` takes the whole room. The category and item
+    filters narrow the set further. Raises ValueError for an unknown
+    location. Returns a summary of the move.
+    """
+    started = time.monotonic()
+    where, params = "roomNum = %s", [from_room]
+    if from_shelf is not None:
+        where += " AND shelfNum = %s"
+        params.append(from_shelf)
+    if main_category:
+        category_filter, category_params = "mainCategory = %s", [main_category]
+        if sub_category:
+            category_filter += " AND subCategory = %s"
+            category_params.append(sub_category)
+        where += f" AND itemID IN (SELECT ItemID FROM Item WHERE {category_filter})"
+        params.extend(category_params)
+    if item_ids:
+        where += f" AND itemID IN ({', '.join(['%s'] * len(item_ids))})"
+        params.extend(item_ids)
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM Location WHERE roomNum = %s AND shelfNum = %s", (to_room, to_shelf))
+        if cursor.fetchone() is None:
+            raise ValueError(f"Room {to_room}, shelf {to_shelf} is not a known location.")
+
+        # Orders whose pieces are about to move, so their watchers can be told
+        cursor.execute(f"""
+            SELECT DISTINCT orderID
+            FROM ItemIn
+            WHERE ItemID IN (SELECT itemID FROM Piece WHERE {where})
+        """, tuple(params))
+        order_ids = [row['orderID'] for row in cursor.fetchall()]
+
+        moved = move_pieces(cursor, where, params, to_room, to_shelf, username,
+                            f"moved from room {from_room}" + (f", shelf {from_shelf}" if from_shelf is not None else ''))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    after_move(order_ids, to_room, to_shelf, username)
+    return {'moved': moved, 'toRoom': to_room, 'toShelf': to_shelf, 'orders': order_ids,
+            'seconds': round(time.monotonic() - started, 3)}
+
+
+def _move_args(values):
+    """Validate bulk move parameters from a form or JSON payload."""
+    def number(name, required=True):
+        value = str(values.get(name) if values.get(name) is not None else '').strip()
+        if not value:
+            if required:
+                raise ValueError(f"{name} is required.")
+            return None
+        if not value.lstrip('-').isdigit():
+            raise ValueError(f"{name} must be a number.")
+        return int(value)
+
+    def text(name):
+        value = values.get(name) or ''
+        if not isinstance(value, str):
+            raise ValueError(f"{name} must be text.")
+        return value.strip() or None
+
+    item_ids = values.get('itemIDs') or []
+    if isinstance(item_ids, str):
+        item_ids = item_ids.replace(',', ' ').split()
+    if not isinstance(item_ids, list) or not all(str(item_id).isdigit() for item_id in item_ids):
+        raise ValueError('itemIDs must be a list of item IDs.')
+    return {
+        'from_room': number('fromRoom'),
+        'from_shelf': number('fromShelf', required=False),
+        'to_room': number('toRoom'),
+        'to_shelf': number('toShelf'),
+        'main_category': text('mainCategory'),
+        'sub_category': text('subCategory'),
+        'item_ids': [int(item_id) for item_id in item_ids],
+    }
+
+
+@movements_bp.route('/move_pieces', methods=['GET', 'POST'])
+@login_required
+def move_pieces_page():
+    """Move every piece on a shelf or in a room to another location."""
+    if not has_role('staff'):
+        flash('Access denied. Only staff members can move pieces.', 'danger')
+        return redirect('/dashboard')
+
+    if request.method == 'POST':
+        try:
+            result = bulk_move(current_app.mysql.connection, username=session['username'],
+                               **_move_args(request.form))
+            flash(f"Moved {result['moved']} pieces to room {result['toRoom']}, "
+                  f"shelf {result['toShelf']} in {result['seconds']}s.", 'success')
+        except ValueError as e:
+            flash(str(e), 'danger')
+        except Exception as e:
+            current_app.logger.error(f"Error in move_pieces: {e}")
+            flash(f"Unable to move pieces. {e}", 'danger')
+        return redirect('/move_pieces')
+
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        cursor.execute("SELECT roomNum, shelfNum FROM Location ORDER BY roomNum, shelfNum")
+        locations = cursor.fetchall()
+        cursor.execute("SELECT DISTINCT mainCategory FROM Category ORDER BY mainCategory")
+        categories = cursor.fetchall()
+    finally:
+        cursor.close()
+    return render_template('move_pieces.html', locations=locations, categories=categories)
+
+
+@movements_bp.route('/api/move_pieces', methods=['POST'])
+@login_required
+def move_pieces_api():
+    """JSON version of /move_pieces."""
+    if not has_role('staff'):
+        return jsonify({'error': 'Access denied.'}), 403
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object describing the move.'}), 400
+    try:
+        return jsonify(bulk_move(current_app.mysql.connection, username=session['username'],
+                                 **_move_args(payload)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@movements_bp.route('/api/items/<int:item_id>/history')
+@login_required
+def item_history(item_id):
+    """Where an item's pieces have been, newest first, with their current location."""
+    if not has_role('staff', 'volunteer'):
+        return jsonify({'error': 'Access denied.'}), 403
+    piece_num = request.args.get('pieceNum', '').strip()
+    if piece_num and not piece_num.isdigit():
+        return jsonify({'error': 'Piece number must be a number.'}), 400
+
+    where, params = "itemID = %s", [item_id]
+    if piece_num:
+        where += " AND pieceNum = %s"
+        params.append(int(piece_num))
+
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT pieceNum, roomNum, shelfNum
+            FROM Piece
+            WHERE {where}
+            ORDER BY pieceNum
+        """, tuple(params))
+        pieces = cursor.fetchall()
+        if not pieces:
+            return jsonify({'error': f'No pieces found for item {item_id}.'}), 404
+
+        # Served by the piece_movement_piece index on (itemID, pieceNum, movedAt)
+        cursor.execute(f"""
+            SELECT pieceNum, fromRoom, fromShelf, toRoom, toShelf, movedBy, reason, movedAt
+            FROM PieceMovement
+            WHERE {where}
+            ORDER BY pieceNum, movedAt DESC, movementID DESC
+        """, tuple(params))
+        history = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    return jsonify({'itemID': item_id, 'pieces': [
+        {**piece, 'movements': [move for move in history if move['pieceNum'] == piece['pieceNum']]}
+        for piece in pieces
+    ]})
@@ -0,0 +1,199 @@
+import json
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from importlib import import_module
+
+# eventType -> (subject, body); formatted with the message payload
+MESSAGES = {
+    'donation_accepted': (
+        'Thank you for your donation',
+        'Hi {fname},\n\nYour donation "{iDescription}" (item {itemID}) has been accepted. Thank you!\n',
+    ),
+    'order_prepared': (
+        'Your order is ready',
+        'Hi {fname},\n\nYour order {orderID} has been prepared and will be delivered soon.\n',
+    ),
+    'wishlist_match': (
+        'An item you asked for has arrived',
+        'Hi {fname},\n\nA donated item matching your request for {category} (item {itemID}) '
+        'is being held for you. Contact us to add it to an order.\n',
+    ),
+}
+
+
+def enqueue_notification(cursor, event_type, recipient, **payload):
+    """Queue a notification for a user.
+
+    Call this with the same cursor, before the same commit, as the change
+    it reports, so the message exists exactly when the change does.
+    """
+    cursor.execute("""
+        INSERT INTO Outbox (eventType, recipient, payload)
+        VALUES (%s, %s, %s)
+    """, (event_type, recipient, json.dumps(payload, default=str)))
+
+
+def render_message(row):
+    """Build (subject, body) for an Outbox row joined with the recipient's Person row."""
+    subject, body = MESSAGES[row['eventType']]
+    fields = {'fname': row['fname'] or row['recipient'], **json.loads(row['payload'])}
+    return subject.format(**fields), body.format(**fields)
+
+
+class LogTransport:
+    """Writes messages to the app log instead of sending them."""
+
+    def __init__(self, app):
+        self.logger = app.logger
+
+    def send_batch(self, messages):
+        for message in messages:
+            self.logger.info(f"Notification to {message['To']}: {message['Subject']}")
+        return {}
+
+
+class SMTPTransport:
+    """Sends a batch of messages over one SMTP connection.
+
+    For local testing, point OUTBOX_SMTP_HOST/PORT at a debugging server
+    such as `python -m aiosmtpd -n -l localhost:1025`.
+    """
+
+    def __init__(self, app):
+        self.host = app.config['OUTBOX_SMTP_HOST']
+        self.port = app.config['OUTBOX_SMTP_PORT']
+
+    def send_batch(self, messages):
+        failures = {}
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            for message in messages:
+                try:
+                    smtp.send_message(message)
+                except smtplib.SMTPException as e:
+                    failures[message['X-Outbox-ID']] = str(e)
+        return failures
+
+
+TRANSPORTS = {'log': LogTransport, 'smtp': SMTPTransport}
+
+
+def load_transport(app):
+    """Build the transport named by OUTBOX_TRANSPORT ('log', 'smtp' or 'module:factory')."""
+    name = app.config['OUTBOX_TRANSPORT']
+    if name in TRANSPORTS:
+        return TRANSPORTS[name](app)
+    module_name, _, factory = name.partition(':')
+    return getattr(import_module(module_name), factory)(app)
+
+
+def drain_once(app, transport):
+    """Send one batch of due messages. Returns the number of messages processed.
+
+    Messages are claimed in a short transaction that counts the attempt and
+    pushes nextAttemptAt out by OUTBOX_CLAIM_SECONDS, so no row locks are
+    held while sending; if the worker dies mid-batch, the claim simply
+    lapses and the messages are retried.
+    """
+    connection = app.mysql.connection
+    cursor = connection.cursor()
+    try:
+        # SKIP LOCKED lets several workers claim from the table without sending twice
+        cursor.execute("""
+            SELECT o.messageID, o.eventType, o.recipient, o.payload, o.attempts, p.fname, p.email
+            FROM Outbox o
+            LEFT JOIN Person p ON p.userName = o.recipient
+            WHERE o.status = 'pending' AND o.nextAttemptAt <= NOW()
+            ORDER BY o.nextAttemptAt
+            LIMIT %s
+            FOR UPDATE OF o SKIP LOCKED
+        """, (app.config['OUTBOX_BATCH_SIZE'],))
+        rows = cursor.fetchall()
+        if rows:
+            placeholders = ', '.join(['%s'] * len(rows))
+            cursor.execute(f"""
+                UPDATE Outbox
+                SET attempts = attempts + 1, nextAttemptAt = NOW() + INTERVAL %s SECOND
+                WHERE messageID IN ({placeholders})
+            """, (app.config['OUTBOX_CLAIM_SECONDS'], *(row['messageID'] for row in rows)))
+        connection.commit()
+        if not rows:
+            return 0
+
+        messages, failures = [], {}
+        for row in rows:
+            message_id = str(row['messageID'])
+            if not row['email']:
+                failures[message_id] = 'recipient has no email address'
+                continue
+            try:
+                subject, body = render_message(row)
+            except (KeyError, ValueError) as e:
+                failures[message_id] = f'could not render message: {e}'
+                continue
+            message = EmailMessage()
+            message['From'] = app.config['OUTBOX_SENDER']
+            message['To'] = row['email']
+            message['Subject'] = subject
+            message['X-Outbox-ID'] = message_id
+            message.set_content(body)
+            messages.append(message)
+
+        if messages:
+            try:
+                failures.update(transport.send_batch(messages))
+            except Exception as e:
+                failures.update({message['X-Outbox-ID']: str(e) for message in messages})
+
+        max_attempts = app.config['OUTBOX_MAX_ATTEMPTS']
+        base_delay = app.config['OUTBOX_RETRY_BASE_SECONDS']
+        sent = [row['messageID'] for row in rows if str(row['messageID']) not in failures]
+        if sent:
+            placeholders = ', '.join(['%s'] * len(sent))
+            cursor.execute(f"""
+                UPDATE Outbox
+                SET status = 'sent', sentAt = NOW()
+                WHERE messageID IN ({placeholders})
+            """, tuple(sent))
+        for row in rows:
+            error = failures.get(str(row['messageID']))
+            if error is None:
+                continue
+            attempts = row['attempts'] + 1
+            cursor.execute("""
+                UPDATE Outbox
+                SET status = %s, attempts = %s, lastError = %s,
+                    nextAttemptAt = NOW() + INTERVAL %s SECOND
+                WHERE messageID = %s
+            """, ('failed' if attempts >= max_attempts else 'pending', attempts, error,
+                  base_delay * 2 ** (attempts - 1), row['messageID']))
+        connection.commit()
+        return len(rows)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def run_worker(app, stop_event=None):
+    """Drain the outbox until stop_event is set, sleeping when it is empty."""
+    transport = load_transport(app)
+    interval = app.config['OUTBOX_POLL_SECONDS']
+    while stop_event is None or not stop_event.is_set():
+        processed = 0
+        try:
+            with app.app_context():
+                processed = drain_once(app, transport)
+        except Exception as e:
+            app.logger.error(f"Error draining outbox: {e}")
+        if not processed:
+            time.sleep(interval)
+
+
+def start_worker(app):
+    """Run the outbox worker in a daemon thread of this process."""
+    thread = threading.Thread(target=run_worker, args=(app,), daemon=True, name='outbox-worker')
+    thread.start()
+    return thread
@@ -0,0 +1,311 @@
+import threading
+import time
+from flask import Blueprint, jsonify, request, render_template, flash, redirect, session, current_app
+from .events import publish_order_event
+from .lifecycle import PICKED, transition_orders, after_transition
+from .utils import login_required, parse_piece_code, has_role
+
+picking_bp = Blueprint('picking', __name__)
+
+
+class PickingSession:
+    """In-memory picking state for one order.
+
+    Found items are buffered and written to ItemIn in a single UPDATE once
+    enough scans have accumulated or the oldest buffered scan is too old.
+    Progress is kept as a running counter, so it never recounts ItemIn rows.
+    """
+
+    def __init__(self, order_id, rows):
+        self.order_id = order_id
+        self.pieces = {}   # itemID -> set of pieceNums still to scan
+        self.found = set()
+        for row in rows:
+            pieces = self.pieces.setdefault(row['ItemID'], set())
+            if row['found']:
+                self.found.add(row['ItemID'])
+            elif row['pieceNum'] is not None:
+                pieces.add(row['pieceNum'])
+        self.total_items = len(self.pieces)
+        self.found_count = len(self.found)
+        self.pending = set()
+        self.pending_scans = 0
+        self.pending_since = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def scan(self, item_id, piece_num):
+        """Record one scan. Returns 'found', 'piece', 'duplicate' or 'unknown'."""
+        self.last_used = time.monotonic()
+        if item_id not in self.pieces:
+            return 'unknown'
+        if item_id in self.found:
+            return 'duplicate'
+
+        remaining = self.pieces[item_id]
+        if piece_num is None:
+            remaining.clear()
+        elif piece_num in remaining:
+            remaining.discard(piece_num)
+        else:
+            return 'duplicate' if remaining else 'unknown'
+
+        self.pending_scans += 1
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+        if remaining:
+            return 'piece'
+
+        self.found.add(item_id)
+        self.found_count += 1
+        self.pending.add(item_id)
+        return 'found'
+
+    def is_due(self, max_scans, max_age_ms):
+        """Whether the buffered updates should be flushed now."""
+        if self.pending_since is None:
+            return False
+        age_ms = (time.monotonic() - self.pending_since) * 1000
+        return self.pending_scans >= max_scans or age_ms >= max_age_ms
+
+    def is_idle(self, max_idle_seconds):
+        """Whether nobody has scanned for this order in max_idle_seconds."""
+        return time.monotonic() - self.last_used >= max_idle_seconds
+
+    def progress(self):
+        return {
+            'orderID': self.order_id,
+            'found': self.found_count,
+            'total': self.total_items,
+            'complete': self.found_count == self.total_items,
+        }
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_flusher_started = False
+
+
+def flush_session(picking, connection):
+    """Write a session's buffered found items to ItemIn in one statement."""
+    with picking.lock:
+        item_ids = sorted(picking.pending)
+        picking.pending.clear()
+        picking.pending_scans = 0
+        picking.pending_since = None
+    if not item_ids:
+        return 0
+
+    cursor = connection.cursor()
+    try:
+        placeholders = ', '.join(['%s'] * len(item_ids))
+        cursor.execute(f"""
+            UPDATE ItemIn
+            SET found = TRUE
+            WHERE orderID = %s AND ItemID IN ({placeholders})
+        """, (picking.order_id, *item_ids))
+        connection.commit()
+    except Exception:
+        # Put the items back so the next flush retries them
+        with picking.lock:
+            picking.pending.update(item_ids)
+            if picking.pending_since is None:
+                picking.pending_since = time.monotonic()
+        raise
+    finally:
+        cursor.close()
+    return len(item_ids)
+
+
+def _flush_loop(app):
+    """Background thread flushing sessions whose oldest scan exceeded the time
+    limit, and discarding sessions that were abandoned without a finish."""
+    max_age_ms = app.config['PICKING_FLUSH_MS']
+    max_idle_seconds = app.config['PICKING_IDLE_SECONDS']
+    while True:
+        time.sleep(max_age_ms / 2000)
+        with _sessions_lock:
+            idle = [s for s in _sessions.values() if s.is_idle(max_idle_seconds)]
+            for picking in idle:
+                del _sessions[picking.order_id]
+            due = [s for s in _sessions.values() if s.is_due(float('inf'), max_age_ms)]
+        if not due and not idle:
+            continue
+        with app.app_context():
+            for picking in due + idle:
+                try:
+                    flush_session(picking, app.mysql.connection)
+                except Exception as e:
+                    app.logger.error(f"Error flushing picking session {picking.order_id}: {e}")
+
+
+def start_flusher(app):
+    """Start the background flush thread once per process."""
+    global _flusher_started
+    with _sessions_lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+    threading.Thread(target=_flush_loop, args=(app,), daemon=True, name='picking-flusher').start()
+
+
+def get_session(order_id):
+    with _sessions_lock:
+        return _sessions.get(order_id)
+
+
+def open_session(order_id):
+    """Load an order's items and pieces once and start a picking session."""
+    picking = get_session(order_id)
+    if picking is not None:
+        return picking
+
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT ii.ItemID, ii.found, p.pieceNum
+            FROM ItemIn ii
+            LEFT JOIN Piece p ON p.itemID = ii.ItemID
+            WHERE ii.orderID = %s
+        """, (order_id,))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if not rows:
+        return None
+
+    start_flusher(current_app._get_current_object())
+    with _sessions_lock:
+        return _sessions.setdefault(order_id, PickingSession(order_id, rows))
+
+
+def close_session(order_id):
+    """Flush and discard a picking session."""
+    with _sessions_lock:
+        picking = _sessions.pop(order_id, None)
+    if picking is not None:
+        try:
+            flush_session(picking, current_app.mysql.connection)
+        except Exception:
+            with _sessions_lock:
+                _sessions.setdefault(order_id, picking)
+            raise
+    return picking
+
+
+def can_pick():
+    return has_role('staff', 'volunteer')
+
+
+@picking_bp.route('/pick', methods=['GET', 'POST'])
+@login_required
+def pick():
+    """Start or resume a picking session for an order."""
+    if not can_pick():
+        flash('Access denied. Only staff and volunteers can pick orders.', 'danger')
+        return redirect('/dashboard')
+
+    if request.method == 'POST':
+        order_id = request.form.get('orderID', '').strip()
+        if not order_id.isdigit():
+            flash('Error: Order ID must be a valid number.', 'danger')
+            return render_template('pick.html', progress=None)
+
+        try:
+            picking = open_session(int(order_id))
+        except Exception as e:
+            current_app.logger.error(f"Error in pick: {e}")
+            flash(f"An unexpected error occurred: {e}", 'danger')
+            return render_template('pick.html', progress=None)
+
+        if picking is None:
+            flash(f"No items found for order ID {order_id}.", 'warning')
+            return render_template('pick.html', progress=None)
+        return render_template('pick.html', progress=picking.progress())
+
+    return render_template('pick.html', progress=None)
+
+
+@picking_bp.route('/api/pick/<int:order_id>/scan', methods=['POST'])
+@login_required
+def pick_scan(order_id):
+    """Record scanned codes for an order in an open picking session."""
+    if not can_pick():
+        return jsonify({'error': 'Access denied.'}), 403
+
+    picking = get_session(order_id)
+    if picking is None:
+        return jsonify({'error': f'No picking session open for order {order_id}.'}), 404
+
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object with a code or a list of codes.'}), 400
+    codes = payload.get('codes') or [payload.get('code', '')]
+    if not isinstance(codes, list):
+        return jsonify({'error': 'codes must be a list of codes.'}), 400
+
+    results = {}
+    found_items = []
+    with picking.lock:
+        for code in codes:
+            parsed = parse_piece_code(code)
+            results[str(code)] = picking.scan(*parsed) if parsed else 'invalid'
+            if results[str(code)] == 'found':
+                found_items.append(parsed[0])
+        due = picking.is_due(current_app.config['PICKING_FLUSH_SCANS'],
+                             current_app.config['PICKING_FLUSH_MS'])
+
+    progress = picking.progress()
+    for item_id in found_items:
+        publish_order_event(order_id, 'found', itemID=item_id, by=session['username'], progress=progress)
+
+    if due:
+        try:
+            flush_session(picking, current_app.mysql.connection)
+        except Exception as e:
+            current_app.logger.error(f"Error flushing picking session {order_id}: {e}")
+
+    return jsonify({'results': results, 'progress': progress})
+
+
+@picking_bp.route('/api/pick/<int:order_id>/progress')
+@login_required
+def pick_progress(order_id):
+    """Return picking progress from the session counter."""
+    if not can_pick():
+        return jsonify({'error': 'Access denied.'}), 403
+    picking = get_session(order_id)
+    if picking is None:
+        return jsonify({'error': f'No picking session open for order {order_id}.'}), 404
+    return jsonify(picking.progress())
+
+
+@picking_bp.route('/api/pick/<int:order_id>/finish', methods=['POST'])
+@login_required
+def pick_finish(order_id):
+    """Flush outstanding scans and close the picking session."""
+    if not can_pick():
+        return jsonify({'error': 'Access denied.'}), 403
+    try:
+        picking = close_session(order_id)
+    except Exception as e:
+        current_app.logger.error(f"Error in pick_finish: {e}")
+        return jsonify({'error': str(e)}), 500
+    if picking is None:
+        return jsonify({'error': f'No picking session open for order {order_id}.'}), 404
+
+    progress = picking.progress()
+    if progress['complete']:
+        # A fully picked order enters the Picked stage unless it is already further along
+        connection = current_app.mysql.connection
+        cursor = connection.cursor()
+        try:
+            result = transition_orders(cursor, [order_id], PICKED, session['username'])
+            connection.commit()
+            after_transition(result, session['username'])
+        except Exception as e:
+            connection.rollback()
+            current_app.logger.error(f"Error marking order {order_id} picked: {e}")
+        finally:
+            cursor.close()
+    return jsonify(progress)
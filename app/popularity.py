@@ -0,0 +1,214 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from .utils import update_state_file
+
+
+class SpaceSaving:
+    """Space-Saving top-k summary.
+
+    Tracks at most ``capacity`` keys. When a new key arrives and the summary
+    is full, the key with the smallest count is replaced and the newcomer
+    inherits that count as its possible overestimate (``errors``).
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def offer(self, key, count=1):
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+        else:
+            victim = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(victim)
+            self.errors.pop(victim)
+            self.counts[key] = floor + count
+            self.errors[key] = floor
+
+    def merge(self, other):
+        """Add another summary's counts, keeping the ``capacity`` heaviest keys."""
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+            self.errors[key] = self.errors.get(key, 0) + other.errors[key]
+        for key in sorted(self.counts, key=self.counts.get)[:max(len(self.counts) - self.capacity, 0)]:
+            del self.counts[key]
+            del self.errors[key]
+
+    def merge_into(self, totals, errors):
+        for key, count in self.counts.items():
+            totals[key] = totals.get(key, 0) + count
+            errors[key] = errors.get(key, 0) + self.errors[key]
+
+
+class WindowedTopK:
+    """Sliding-window heavy hitters built from a ring of Space-Saving buckets.
+
+    Each window is split into fixed-width time buckets. Recording only
+    touches the current bucket; queries merge the buckets still inside the
+    window, so memory stays at ``capacity`` keys per bucket.
+    """
+
+    WINDOWS = {
+        'hour': (300, 12),     # 12 five-minute buckets
+        'day': (3600, 24),     # 24 one-hour buckets
+        'week': (86400, 7),    # 7 one-day buckets
+    }
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # window -> {bucket number: SpaceSaving}
+        self.buckets = {window: {} for window in self.WINDOWS}
+
+    def record(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for window, (width, count) in self.WINDOWS.items():
+                current = int(now // width)
+                buckets = self.buckets[window]
+                if current not in buckets:
+                    for stale in [number for number in buckets if number <= current - count]:
+                        del buckets[stale]
+                    buckets[current] = SpaceSaving(self.capacity)
+                buckets[current].offer(key)
+
+    def merge(self, other, now=None):
+        """Add another tracker's counts, bucket by bucket, dropping expired buckets."""
+        now = time.time() if now is None else now
+        with self._lock, other._lock:
+            for window, (width, count) in self.WINDOWS.items():
+                oldest = int(now // width) - count + 1
+                buckets = self.buckets[window]
+                for number, summary in other.buckets[window].items():
+                    if number >= oldest:
+                        buckets.setdefault(number, SpaceSaving(self.capacity)).merge(summary)
+                for stale in [number for number in buckets if number < oldest]:
+                    del buckets[stale]
+
+    def top(self, window, limit=10, now=None):
+        """Return the heaviest keys in a window as (key, count, error) tuples."""
+        now = time.time() if now is None else now
+        width, count = self.WINDOWS[window]
+        oldest = int(now // width) - count + 1
+        totals, errors = {}, {}
+        with self._lock:
+            for number, summary in self.buckets[window].items():
+                if number >= oldest:
+                    summary.merge_into(totals, errors)
+        ranked = sorted(totals.items(), key=lambda entry: entry[1], reverse=True)[:limit]
+        return [(key, total, errors[key]) for key, total in ranked]
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'buckets': {
+                    window: [
+                        [number, [[list(key), summary.counts[key], summary.errors[key]]
+                                  for key in summary.counts]]
+                        for number, summary in buckets.items()
+                    ]
+                    for window, buckets in self.buckets.items()
+                },
+            }
+
+    @classmethod
+    def from_dict(cls, data, capacity):
+        tracker = cls(capacity)
+        for window, buckets in data.get('buckets', {}).items():
+            if window not in tracker.buckets:
+                continue
+            for number, entries in buckets:
+                summary = SpaceSaving(tracker.capacity)
+                for key, count, error in entries:
+                    summary.counts[tuple(key)] = count
+                    summary.errors[tuple(key)] = error
+                tracker.buckets[window][number] = summary
+        return tracker
+
+
+class CategoryPopularity:
+    """Most requested categories, persisted to a JSON file periodically.
+
+    Every worker process keeps the counts it recorded since its last save
+    apart (``pending``) and adds them to the saved state under a file lock,
+    then reads back the combined counts, so processes never overwrite each
+    other's requests.
+    """
+
+    def __init__(self):
+        self.tracker = None   # saved state plus this process's recent counts
+        self.pending = None   # counts recorded here since the last save
+        self.capacity = None
+        self.path = None
+        self.persist_seconds = 60
+        self.last_saved = time.monotonic()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.path = app.config['POPULARITY_STATE_PATH']
+        self.persist_seconds = app.config['POPULARITY_PERSIST_SECONDS']
+        self.capacity = app.config['POPULARITY_CAPACITY']
+        self.tracker = WindowedTopK(self.capacity)
+        self.pending = WindowedTopK(self.capacity)
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as state_file:
+                    self.tracker = WindowedTopK.from_dict(json.load(state_file), self.capacity)
+            except (OSError, ValueError) as e:
+                app.logger.error(f"Could not load category popularity state: {e}")
+        atexit.register(self.save)
+
+    def record(self, main_category, sub_category):
+        now = time.time()
+        with self._lock:
+            self.tracker.record((main_category, sub_category), now)
+            self.pending.record((main_category, sub_category), now)
+        if time.monotonic() - self.last_saved > self.persist_seconds:
+            try:
+                self.save()
+            except OSError as e:
+                logging.getLogger(__name__).error(f"Could not save category popularity state: {e}")
+
+    def top(self, window, limit=10):
+        return [
+            {'mainCategory': key[0], 'subCategory': key[1], 'count': count, 'maxOvercount': error}
+            for key, count, error in self.tracker.top(window, limit)
+        ]
+
+    def save(self):
+        """Add this process's new counts to the saved state and reload the total."""
+        self.last_saved = time.monotonic()
+        if not self.path:
+            return
+        with self._lock:
+            pending, self.pending = self.pending, WindowedTopK(self.capacity)
+
+        def merge(data):
+            saved = WindowedTopK.from_dict(data, self.capacity) if data else WindowedTopK(self.capacity)
+            saved.merge(pending)
+            return saved.to_dict()
+
+        try:
+            data = update_state_file(self.path, merge)
+        except Exception:
+            # Keep the counts for the next attempt
+            with self._lock:
+                pending.merge(self.pending)
+                self.pending = pending
+            raise
+        tracker = WindowedTopK.from_dict(data, self.capacity)
+        with self._lock:
+            tracker.merge(self.pending)   # recorded while saving
+            self.tracker = tracker
+
+
+popularity = CategoryPopularity()
@@ -0,0 +1,148 @@
+import csv
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from .jobs import job_type
+from .utils import hash_password
+
+USER_FIELDS = ('username', 'password', 'fname', 'lname', 'email', 'role')
+VALID_ROLES = ('staff', 'volunteer', 'client', 'donor')
+
+
+def read_users(lines):
+    """Parse CSV lines with a header row of USER_FIELDS.
+
+    Returns (users, invalid) where invalid holds (line number, reason) pairs.
+    """
+    users, invalid, seen = [], [], set()
+    reader = csv.DictReader(lines)
+    missing = [field for field in USER_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        return [], [(1, f"missing column(s): {', '.join(missing)}")]
+
+    for line_number, row in enumerate(reader, start=2):
+        user = {field: (row.get(field) or '').strip() for field in USER_FIELDS}
+        user['role'] = user['role'].lower()
+        if not user['username'] or not user['password']:
+            invalid.append((line_number, 'username and password are required'))
+        elif user['role'] not in VALID_ROLES:
+            invalid.append((line_number, f"unknown role '{user['role']}'"))
+        elif user['username'].lower() in seen:
+            # Person's collation ignores case, so 'Alice' and 'alice' collide
+            invalid.append((line_number, f"username '{user['username']}' repeated in file"))
+        else:
+            seen.add(user['username'].lower())
+            users.append(user)
+    return users, invalid
+
+
+def _hash_for_pool(password, rounds):
+    return hash_password(password, rounds).decode('utf-8')
+
+
+def existing_usernames(cursor, usernames, chunk_size=1000):
+    """Return the usernames already present in Person, lowercased (matching ignores case)."""
+    existing = set()
+    for start in range(0, len(usernames), chunk_size):
+        chunk = usernames[start:start + chunk_size]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f"SELECT userName FROM Person WHERE userName IN ({placeholders})", tuple(chunk))
+        existing.update(row['userName'].lower() for row in cursor.fetchall())
+    return existing
+
+
+def provision_users(connection, users, rounds, workers=None, batch_size=200):
+    """Create Person and Act rows for new users, hashing passwords in a process pool.
+
+    Usernames that already exist, in any letter case, are skipped. Rows are
+    inserted and committed in batches of batch_size; if a batch fails, it is
+    rolled back and provisioning stops, with the users committed so far
+    reported in ``created`` and the error in ``failed``. Returns a report
+    dict.
+
+    The pool spawns fresh interpreters rather than forking, since callers
+    (job workers, the dev server) are multi-threaded.
+    """
+    started = time.perf_counter()
+    created, failed = 0, None
+    cursor = connection.cursor()
+    try:
+        existing = existing_usernames(cursor, [user['username'] for user in users])
+        new_users = [user for user in users if user['username'].lower() not in existing]
+        skipped = sorted(user['username'] for user in users if user['username'].lower() in existing)
+
+        hash_started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            hashes = list(pool.map(_hash_for_pool,
+                                   [user['password'] for user in new_users],
+                                   [rounds] * len(new_users),
+                                   chunksize=max(1, len(new_users) // 32)))
+        hash_seconds = time.perf_counter() - hash_started
+
+        for start in range(0, len(new_users), batch_size):
+            batch = list(zip(new_users[start:start + batch_size], hashes[start:start + batch_size]))
+            try:
+                cursor.executemany(
+                    "INSERT INTO Person (userName, password, fname, lname, email) VALUES (%s, %s, %s, %s, %s)",
+                    [(user['username'], hashed, user['fname'], user['lname'], user['email'])
+                     for user, hashed in batch],
+                )
+                cursor.executemany(
+                    "INSERT INTO Act (userName, roleID) VALUES (%s, %s)",
+                    [(user['username'], user['role']) for user, _ in batch],
+                )
+                connection.commit()
+            except Exception as e:
+                connection.rollback()
+                failed = (f"stopped at the batch starting with '{batch[0][0]['username']}' "
+                          f"after creating {created} users: {e}")
+                break
+            created += len(batch)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    seconds = time.perf_counter() - started
+    return {
+        'created': created,
+        'notCreated': len(new_users) - created,
+        'failed': failed,
+        'skipped': skipped,
+        'seconds': round(seconds, 2),
+        'hashSeconds': round(hash_seconds, 2),
+        'usersPerSecond': round(created / seconds, 1) if seconds else None,
+    }
+
+
+def discard_upload(payload):
+    """Delete an uploaded user list; it holds plaintext passwords."""
+    if os.path.exists(payload['path']):
+        os.remove(payload['path'])
+
+
+def expire_uploads(directory, max_age_seconds):
+    """Delete uploaded user lists older than max_age_seconds whose job never ran."""
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith('users-') and name.endswith('.csv') and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+@job_type('provision_users', discard=discard_upload)
+def provision_users_job(job, payload):
+    """Job handler: create the users listed in an uploaded CSV file, then delete it."""
+    try:
+        if not os.path.exists(payload['path']):
+            raise ValueError('The uploaded user list has expired; please upload it again.')
+        with open(payload['path'], newline='', encoding='utf-8-sig') as users_file:
+            users, invalid = read_users(users_file)
+        job.progress(5, f"Hashing passwords for {len(users)} users")
+        report = provision_users(current_app.mysql.connection, users, current_app.config['BCRYPT_ROUNDS'])
+    finally:
+        discard_upload(payload)
+    return {**report, 'invalid': invalid}
@@ -0,0 +1,220 @@
+import atexit
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from .archive import order_tables
+from .utils import update_state_file
+
+
+class CooccurrenceIndex:
+    """Sparse category co-occurrence counts over past orders.
+
+    ``orders[c]`` is the number of orders containing category c, and
+    ``pairs[a][b]`` the number containing both a and b (kept symmetric).
+    Categories are (mainCategory, subCategory) tuples. Only pairs that
+    actually occur are stored, so memory grows with real co-occurrences
+    rather than categories squared.
+    """
+
+    def __init__(self):
+        self.orders = {}
+        self.pairs = {}
+
+    def add_order(self, categories):
+        """Count one order's distinct categories."""
+        categories = sorted(set(categories))
+        for index, a in enumerate(categories):
+            self.orders[a] = self.orders.get(a, 0) + 1
+            for b in categories[index + 1:]:
+                self._bump(a, b)
+
+    def add_category(self, category, existing):
+        """Count a category newly added to an order that already has ``existing``."""
+        if category in existing:
+            return
+        self.orders[category] = self.orders.get(category, 0) + 1
+        for other in set(existing):
+            self._bump(category, other)
+
+    def merge(self, other):
+        """Add another index's counts to this one."""
+        for category, count in other.orders.items():
+            self.orders[category] = self.orders.get(category, 0) + count
+        for a, row in other.pairs.items():
+            mine = self.pairs.setdefault(a, {})
+            for b, count in row.items():
+                mine[b] = mine.get(b, 0) + count
+
+    def _bump(self, a, b):
+        row = self.pairs.setdefault(a, {})
+        row[b] = row.get(b, 0) + 1
+        row = self.pairs.setdefault(b, {})
+        row[a] = row.get(a, 0) + 1
+
+    def recommend(self, basket, limit=5, min_support=2):
+        """Categories most likely to go with ``basket``, best first.
+
+        A candidate's score is the sum over basket categories s of
+        P(candidate | s) = pairs[s][candidate] / orders[s], counting only
+        pairs seen in at least ``min_support`` orders.
+        """
+        basket = set(basket)
+        scores = {}
+        for s in basket:
+            total = self.orders.get(s)
+            if not total:
+                continue
+            for candidate, count in self.pairs.get(s, {}).items():
+                if count >= min_support and candidate not in basket:
+                    scores[candidate] = scores.get(candidate, 0.0) + count / total
+        return heapq.nlargest(limit, scores.items(), key=lambda entry: entry[1])
+
+    def to_dict(self):
+        return {
+            'orders': [[main, sub, count] for (main, sub), count in self.orders.items()],
+            'pairs': [[a[0], a[1], b[0], b[1], count]
+                      for a, row in self.pairs.items() for b, count in row.items() if a < b],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        index.orders = {(main, sub): count for main, sub, count in data['orders']}
+        for a_main, a_sub, b_main, b_sub, count in data['pairs']:
+            a, b = (a_main, a_sub), (b_main, b_sub)
+            index.pairs.setdefault(a, {})[b] = count
+            index.pairs.setdefault(b, {})[a] = count
+        return index
+
+
+def build_index(connection):
+    """Build the co-occurrence index from every past order, archived ones included."""
+    tables = order_tables(include_archive=True)
+    index = CooccurrenceIndex()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT DISTINCT ii.orderID, i.mainCategory, i.subCategory
+            FROM {tables['ItemIn']} ii
+            JOIN Item i ON i.ItemID = ii.ItemID
+            ORDER BY ii.orderID
+        """)
+        current, basket = None, []
+        for row in cursor.fetchall():
+            if row['orderID'] != current:
+                index.add_order(basket)
+                current, basket = row['orderID'], []
+            basket.append((row['mainCategory'], row['subCategory']))
+        index.add_order(basket)
+    finally:
+        cursor.close()
+    return index
+
+
+class Recommendations:
+    """Co-occurrence index built offline, updated as items are ordered and
+    persisted to a JSON file periodically.
+
+    The index is built by `flask build-recommendations`, never inside a
+    request; until then there are no recommendations. Like the popularity
+    tracker, each worker process adds only the orders it saw since its last
+    save to the saved index, under a file lock, then reloads the total.
+    """
+
+    def __init__(self):
+        self.index = None     # saved index plus this process's recent orders
+        self.pending = None   # co-occurrences recorded here since the last save
+        self.path = None
+        self.persist_seconds = 60
+        self.last_saved = time.monotonic()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.path = app.config['RECOMMEND_STATE_PATH']
+        self.persist_seconds = app.config['RECOMMEND_PERSIST_SECONDS']
+        try:
+            self._load()
+        except (OSError, ValueError, KeyError) as e:
+            app.logger.error(f"Could not load recommendation state: {e}")
+        atexit.register(self.save)
+
+    def _load(self):
+        """Pick up a saved index, e.g. one built by the CLI after this process started."""
+        if self.index is not None or not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path) as state_file:
+            index = CooccurrenceIndex.from_dict(json.load(state_file))
+        with self._lock:
+            if self.index is None:
+                self.index, self.pending = index, CooccurrenceIndex()
+
+    def rebuild(self, connection):
+        """Build the index from every past order and replace the saved state with it."""
+        index = build_index(connection)
+        if self.path:
+            update_state_file(self.path, lambda data: index.to_dict())
+        with self._lock:
+            self.index, self.pending = index, CooccurrenceIndex()
+        self.last_saved = time.monotonic()
+        return index
+
+    def record(self, category, existing):
+        if self.index is None:
+            return
+        with self._lock:
+            self.index.add_category(category, existing)
+            self.pending.add_category(category, existing)
+        if time.monotonic() - self.last_saved > self.persist_seconds:
+            try:
+                self.save()
+            except OSError as e:
+                logging.getLogger(__name__).error(f"Could not save recommendation state: {e}")
+
+    def recommend(self, basket, limit, min_support):
+        """Ranked (category, score) pairs; empty until an index has been built."""
+        if self.index is None:
+            try:
+                self._load()
+            except (OSError, ValueError, KeyError) as e:
+                logging.getLogger(__name__).error(f"Could not load recommendation state: {e}")
+                return []
+            if self.index is None:
+                return []
+        with self._lock:
+            return self.index.recommend(basket, limit, min_support)
+
+    def save(self):
+        """Add this process's new co-occurrences to the saved index and reload the total."""
+        self.last_saved = time.monotonic()
+        if not self.path or self.index is None:
+            return
+        with self._lock:
+            pending, self.pending = self.pending, CooccurrenceIndex()
+            current = self.index.to_dict()
+
+        def merge(data):
+            if data is None:
+                # Nothing saved (yet, or any more): this process's index is the best there is
+                return current
+            saved = CooccurrenceIndex.from_dict(data)
+            saved.merge(pending)
+            return saved.to_dict()
+
+        try:
+            data = update_state_file(self.path, merge)
+        except Exception:
+            # Keep the co-occurrences for the next attempt
+            with self._lock:
+                pending.merge(self.pending)
+                self.pending = pending
+            raise
+        index = CooccurrenceIndex.from_dict(data)
+        with self._lock:
+            index.merge(self.pending)   # recorded while saving
+            self.index = index
+
+
+recommendations = Recommendations()
@@ -1,5 +1,15 @@
 from flask import Blueprint, jsonify, request, render_template, flash, redirect, session, current_app
-from .utils import login_required
+from .archive import order_tables
+from .cache import report_cache, invalidate_user_tasks
+from .dedupe import detector, donation_attributes
+from .lifecycle import PREPARED, current_status, transition_orders, after_transition
+from .movements import record_placement
+from .outbox import enqueue_notification
+from .popularity import popularity
+from .recommend import recommendations
+from .stats import counters
+from .utils import login_required, parse_piece_code, has_role
+from .wishlist import NOT_RESERVED_FOR_OTHERS, match_donation, item_ordered
 from datetime import datetime
 
 
@@ -11,7 +21,14 @@ routes_bp = Blueprint('routes', __name__)
 @login_required
 def dashboard():
     """User dashboard."""
-    return render_template('dashboard.html', username=session['username'], role=session['role'])
+    stats = None
+    try:
+        counters.ensure_current(current_app.mysql.connection, current_app.config['DASHBOARD_RESEED_SECONDS'])
+        stats = counters.snapshot()
+    except Exception as e:
+        current_app.logger.error(f"Error loading dashboard counters: {e}")
+    return render_template('dashboard.html', username=session['username'], role=session['role'],
+                           roles=session.get('roles', [session['role']]), stats=stats)
 
 @routes_bp.route('/test_db')
 @login_required
@@ -64,12 +81,94 @@ def find_item():
 
     return render_template('find_item.html', item=None, pieces=None)
 
+@routes_bp.route('/api/find_items', methods=['POST'])
+@login_required
+def find_items():
+    """Look up a batch of scanned item or item:piece codes in one query."""
+    payload = request.get_json(silent=True)
+    if payload is not None:
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Expected a JSON object with a list of codes.'}), 400
+        codes = payload.get('codes', [])
+    else:
+        codes = request.form.get('codes', '').replace(',', '\n').split()
+
+    if not isinstance(codes, list) or not codes:
+        return jsonify({'error': 'A non-empty list of codes is required.'}), 400
+
+    limit = current_app.config['SCAN_BATCH_LIMIT']
+    if len(codes) > limit:
+        return jsonify({'error': f'At most {limit} codes can be looked up at once.'}), 400
+
+    invalid = []
+    requested = {}  # itemID -> set of pieceNums, or None for the whole item
+    for code in codes:
+        parsed = parse_piece_code(code)
+        if parsed is None:
+            invalid.append(code)
+            continue
+        item_id, piece_num = parsed
+        if piece_num is None:
+            requested[item_id] = None
+        elif item_id not in requested or requested[item_id] is not None:
+            requested.setdefault(item_id, set()).add(piece_num)
+
+    if not requested:
+        return jsonify({'items': [], 'notFound': [], 'invalid': invalid})
+
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        placeholders = ', '.join(['%s'] * len(requested))
+        cursor.execute(f"""
+            SELECT i.itemID, i.iDescription, i.mainCategory, i.subCategory,
+                   p.pieceNum, p.pDescription, p.roomNum, p.shelfNum
+            FROM Item i
+            LEFT JOIN Piece p ON p.itemID = i.itemID
+            WHERE i.itemID IN ({placeholders})
+            ORDER BY i.itemID, p.pieceNum
+        """, tuple(requested))
+        rows = cursor.fetchall()
+    except Exception as e:
+        current_app.logger.error(f"Error in find_items: {e}")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+
+    items = {}
+    for row in rows:
+        item = items.setdefault(row['itemID'], {
+            'itemID': row['itemID'],
+            'iDescription': row['iDescription'],
+            'mainCategory': row['mainCategory'],
+            'subCategory': row['subCategory'],
+            'pieces': [],
+        })
+        wanted = requested[row['itemID']]
+        if row['pieceNum'] is not None and (wanted is None or row['pieceNum'] in wanted):
+            item['pieces'].append({
+                'pieceNum': row['pieceNum'],
+                'pDescription': row['pDescription'],
+                'roomNum': row['roomNum'],
+                'shelfNum': row['shelfNum'],
+            })
+
+    not_found = []
+    for item_id, wanted in requested.items():
+        if item_id not in items:
+            not_found.append(str(item_id))
+        elif wanted is not None:
+            found = {piece['pieceNum'] for piece in items[item_id]['pieces']}
+            not_found.extend(f"{item_id}:{num}" for num in sorted(wanted - found))
+
+    return jsonify({'items': list(items.values()), 'notFound': not_found, 'invalid': invalid})
+
 @routes_bp.route('/find_order', methods=['GET', 'POST'])
 @login_required
 def find_order():
     """Find items in an order and their locations."""
     if request.method == 'POST':
         order_id = request.form.get('orderID', '').strip()
+        include_archive = request.form.get('includeArchive') == 'yes'
 
         # Validate input
         if not order_id.isdigit():
@@ -78,17 +177,22 @@ def find_order():
 
         cursor = current_app.mysql.connection.cursor()
         try:
-            # Check if the order exists
+            # Check if the order exists, in the archive too only when asked
+            tables = order_tables()
             cursor.execute("SELECT * FROM Ordered WHERE orderID = %s", (order_id,))
             order = cursor.fetchone()
+            if not order and include_archive:
+                tables = {'Ordered': 'OrderedArchive', 'ItemIn': 'ItemInArchive'}
+                cursor.execute("SELECT * FROM OrderedArchive WHERE orderID = %s", (order_id,))
+                order = cursor.fetchone()
             if not order:
                 flash(f"No order found with ID {order_id}.", 'danger')
                 return render_template('find_order.html', order=None, items=None)
 
             # Fetch items in the order
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT i.ItemID, i.iDescription
-                FROM ItemIn ii
+                FROM {tables['ItemIn']} ii
                 JOIN Item i ON ii.ItemID = i.ItemID
                 WHERE ii.orderID = %s
             """, (order_id,))
@@ -123,7 +227,7 @@ def find_order():
 @login_required
 def accept_donation():
     # Ensure the user is a staff member
-    if 'staff' not in session.get('role', '').lower():
+    if not has_role('staff'):
         flash("Access denied. Only staff members can accept donations.", "danger")
         return redirect('/dashboard')
 
@@ -168,16 +272,29 @@ def accept_donation():
                 INSERT INTO piece (itemID, pieceNum, pDescription, length, width, height, roomNum, shelfNum, pNotes)
                 VALUES (%s, 1, %s, %s, %s, %s, %s, %s, %s)
             """, (item_id, item_description, length, width, height, room_num, shelf_num, piece_notes))
+            record_placement(cursor, item_id, 1, room_num, shelf_num, session['username'], 'donation')
             current_app.mysql.connection.commit()
 
-            # Record the donation
+            # Record the donation, queue the donor's thank-you and reserve the item for
+            # a waiting client request in the same transaction
             cursor.execute("""
                 INSERT INTO donatedby (itemID, userName, donateDate)
                 VALUES (%s, %s, NOW())
             """, (item_id, donor_id))
+            enqueue_notification(cursor, 'donation_accepted', donor_id,
+                                 itemID=item_id, iDescription=item_description)
+            reserved_for = match_donation(cursor, item_id, main_category, sub_category, color, material, is_new)
             current_app.mysql.connection.commit()
+            duplicates = detector.check(current_app.mysql.connection, item_id, item_description, donation_attributes(
+                donor_id, main_category, sub_category, color, material, length, width, height))
 
             flash("Donation accepted successfully!", "success")
+            if duplicates:
+                flash(f"Item {item_id} looks like a duplicate of item {duplicates[0][0]}; "
+                      f"it has been flagged for review.", "warning")
+            if reserved_for:
+                flash(f"Item {item_id} is reserved for {reserved_for['client']} "
+                      f"(request {reserved_for['requestID']}).", "info")
             return redirect('/dashboard')
 
         # Fetch rooms for dropdown
@@ -198,7 +315,7 @@ def accept_donation():
 def start_order():
     """Start an order for a client."""
     # Check if the logged-in user is a staff member
-    if 'staff' not in session.get('role', '').lower():
+    if not has_role('staff'):
         flash('Access denied. Only staff members can start an order.', 'danger')
         return redirect('/dashboard')
 
@@ -229,6 +346,7 @@ def start_order():
             # Get the newly created order ID
             order_id = cursor.lastrowid
             current_app.mysql.connection.commit()
+            invalidate_user_tasks(session['username'], client_username)
 
             # Save the order ID in the session
             session['order_id'] = order_id
@@ -246,7 +364,7 @@ def start_order():
 @login_required
 def add_to_order():
     """Add items to the current order."""
-    if 'staff' not in session.get('role', '').lower():
+    if not has_role('staff'):
         flash('Access denied. Only staff members can start an order.', 'danger')
         return redirect('/dashboard')
 
@@ -278,7 +396,27 @@ def add_to_order():
                     INSERT INTO ItemIn (ItemID, orderID, found)
                     VALUES (%s, %s, FALSE)
                 """, (item_id, session['order_id']))
+                item_ordered(cursor, item_id, order['client'])
                 current_app.mysql.connection.commit()
+
+                cursor.execute("""
+                    SELECT i.mainCategory, i.subCategory,
+                           (SELECT COUNT(*) FROM ItemIn WHERE orderID = %s) AS itemCount
+                    FROM Item i
+                    WHERE i.ItemID = %s
+                """, (session['order_id'], item_id))
+                added = cursor.fetchone()
+                if added:
+                    counters.item_ordered(added['mainCategory'], added['itemCount'] == 1)
+                    popularity.record(added['mainCategory'], added['subCategory'])
+                    cursor.execute("""
+                        SELECT DISTINCT i.mainCategory, i.subCategory
+                        FROM ItemIn ii
+                        JOIN Item i ON i.ItemID = ii.ItemID
+                        WHERE ii.orderID = %s AND ii.ItemID <> %s
+                    """, (session['order_id'], item_id))
+                    recommendations.record((added['mainCategory'], added['subCategory']),
+                                           [(row['mainCategory'], row['subCategory']) for row in cursor.fetchall()])
                 flash(f"Item ID {item_id} added to order ID {session['order_id']}.", 'success')
                 return redirect('/add_to_order')
             except Exception as e:
@@ -297,12 +435,15 @@ def add_to_order():
             main_category = request.args.get('mainCategory').strip()
             sub_category = request.args.get('subCategory').strip()
 
-            cursor.execute("""
+            # Items held for another client's wishlist request are not offered
+            cursor.execute(f"""
                 SELECT ItemID, iDescription
                 FROM Item
                 WHERE mainCategory = %s AND subCategory = %s
                 AND ItemID NOT IN (SELECT ItemID FROM ItemIn)
-            """, (main_category, sub_category))
+                AND ItemID NOT IN (SELECT ItemID FROM ItemInArchive)
+                AND {NOT_RESERVED_FOR_OTHERS}
+            """, (main_category, sub_category, order['client']))
             items = cursor.fetchall()
 
             if not items:
@@ -350,7 +491,7 @@ def get_subcategories():
 def prepare_order():
     """Prepare an order for delivery."""
     # Ensure the user is staff
-    if 'staff' not in session.get('role', '').lower():
+    if not has_role('staff'):
         flash('Access denied. Only staff members can prepare orders.', 'danger')
         return redirect('/dashboard')
 
@@ -386,22 +527,17 @@ def prepare_order():
                 flash(f"No items found for order ID {order_id}.", 'warning')
                 return render_template('prepare_order.html', order=order, items=None)
 
-            # Mark the order as prepared (update the item locations to a holding location)
-            cursor.execute("""
-                UPDATE Piece
-                SET roomNum = -1, shelfNum = -1
-                WHERE ItemID IN (
-                    SELECT ItemID FROM ItemIn WHERE orderID = %s
-                )
-            """, (order_id,))
-            current_app.mysql.connection.commit()
+            # Move the order to Prepared; rejected if it is already past that stage
+            result = transition_orders(cursor, [order_id], PREPARED, session['username'])
+            if result['rejected']:
+                current_app.mysql.connection.rollback()
+                flash(f"Order ID {order_id} cannot be prepared: {result['rejected'][int(order_id)]}.", 'danger')
+                return render_template('prepare_order.html', order=order, items=items)
 
-            # Add an entry to the Delivered table
-            cursor.execute("""
-                INSERT INTO Delivered (userName, orderID, status, date)
-                VALUES (%s, %s, %s, CURRENT_DATE())
-            """, (session['username'], order_id, "Prepared"))
+            # The transition moved the item's pieces to the holding location
+            # and queued the client's notification
             current_app.mysql.connection.commit()
+            after_transition(result, session['username'])
 
             flash(f"Order ID {order_id} is now prepared for delivery.", 'success')
             return redirect('/dashboard')
@@ -416,52 +552,163 @@ def prepare_order():
     finally:
         cursor.close()
 
-@routes_bp.route('/user_tasks', methods=['GET'])
-@login_required
-def user_tasks():
-    """Show all orders associated with the current user."""
+
+def load_user_tasks(username, roles, include_archive=False, limit=50, offset=0):
+    """A page of a user's tasks across their roles, with counts by status.
+
+    Each role held takes one query for the page (``limit`` rows from
+    ``offset``, newest first) and one for the counts, both on an index led
+    by the user column (see schema.sql). The current status of each order
+    is a correlated lookup by order ID rather than a pass over Delivered.
+    """
+    tables = order_tables(include_archive)
+    status = f"COALESCE({current_status('o.orderID', include_archive)}, 'Open')"
+    tasks, counts = {}, {}
     cursor = current_app.mysql.connection.cursor()
     try:
-        username = session['username']
-        role = session['role'].lower()
-
-        orders = []
-        if 'client' in role:
-            # Fetch orders where the user is a client
-            cursor.execute("""
-                SELECT o.orderID, o.orderDate, o.orderNotes, o.supervisor
-                FROM Ordered o
+        if 'client' in roles:
+            # Orders placed for the user as a client
+            cursor.execute(f"""
+                SELECT o.orderID, o.orderDate, o.orderNotes, o.supervisor, {status} AS status
+                FROM {tables['Ordered']} o
+                WHERE o.client = %s
+                ORDER BY o.orderDate DESC, o.orderID DESC
+                LIMIT %s OFFSET %s
+            """, (username, limit, offset))
+            tasks['client'] = cursor.fetchall()
+            cursor.execute(f"""
+                SELECT {status} AS status, COUNT(*) AS orders
+                FROM {tables['Ordered']} o
                 WHERE o.client = %s
+                GROUP BY 1
             """, (username,))
-            orders = cursor.fetchall()
+            counts['client'] = {row['status']: row['orders'] for row in cursor.fetchall()}
 
-        elif 'staff' in role:
-            # Fetch orders where the user is a supervisor
-            cursor.execute("""
-                SELECT o.orderID, o.orderDate, o.orderNotes, o.client
-                FROM Ordered o
+        if 'staff' in roles:
+            # Orders the user supervises
+            cursor.execute(f"""
+                SELECT o.orderID, o.orderDate, o.orderNotes, o.client, {status} AS status
+                FROM {tables['Ordered']} o
+                WHERE o.supervisor = %s
+                ORDER BY o.orderDate DESC, o.orderID DESC
+                LIMIT %s OFFSET %s
+            """, (username, limit, offset))
+            tasks['supervised'] = cursor.fetchall()
+            cursor.execute(f"""
+                SELECT {status} AS status, COUNT(*) AS orders
+                FROM {tables['Ordered']} o
                 WHERE o.supervisor = %s
+                GROUP BY 1
             """, (username,))
-            orders = cursor.fetchall()
+            counts['supervised'] = {row['status']: row['orders'] for row in cursor.fetchall()}
 
-        elif 'volunteer' in role:
-            # Fetch orders where the user is linked in Delivered table
-            cursor.execute("""
+        if 'staff' in roles or 'volunteer' in roles:
+            # Deliveries assigned to the user
+            cursor.execute(f"""
                 SELECT d.orderID, o.orderDate, o.orderNotes, o.supervisor, o.client, d.status, d.date
-                FROM Delivered d
-                JOIN Ordered o ON d.orderID = o.orderID
+                FROM {tables['Delivered']} d
+                JOIN {tables['Ordered']} o ON d.orderID = o.orderID
                 WHERE d.userName = %s
+                ORDER BY d.date DESC, d.orderID DESC
+                LIMIT %s OFFSET %s
+            """, (username, limit, offset))
+            tasks['deliveries'] = cursor.fetchall()
+            cursor.execute(f"""
+                SELECT d.status, COUNT(*) AS orders
+                FROM {tables['Delivered']} d
+                WHERE d.userName = %s
+                GROUP BY d.status
             """, (username,))
-            orders = cursor.fetchall()
+            counts['deliveries'] = {row['status']: row['orders'] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+    return {'tasks': tasks, 'counts': counts, 'limit': limit, 'offset': offset}
+
+
+def task_page_args():
+    """The limit and offset requested for a task list, or None if malformed."""
+    limit = request.args.get('limit', '50').strip()
+    offset = request.args.get('offset', '0').strip()
+    if not limit.isdigit() or not offset.isdigit() or not 0 < int(limit) <= 500:
+        return None
+    return int(limit), int(offset)
 
-        else:
-            flash('No relevant tasks for your role.', 'info')
 
-        return render_template('user_tasks.html', orders=orders, role=role)
+def cached_user_tasks(include_archive=False, limit=50, offset=0):
+    """The current user's tasks, cached briefly per user and page."""
+    username = session['username']
+    roles = tuple(session.get('roles', [session['role']]))
+    return report_cache.get_or_compute(
+        ('user_tasks', username, roles, include_archive, limit, offset),
+        lambda: load_user_tasks(username, roles, include_archive, limit, offset),
+        current_app.config['USER_TASKS_CACHE_TTL'],
+    )
+
+
+@routes_bp.route('/user_tasks', methods=['GET'])
+@login_required
+def user_tasks():
+    """Show all orders associated with the current user, across all their roles."""
+    include_archive = request.args.get('archived') == '1'
+    page = task_page_args()
+    if page is None:
+        flash('Limit must be between 1 and 500 and offset a number.', 'danger')
+        return redirect('/user_tasks')
+    try:
+        result = cached_user_tasks(include_archive, *page)
+        if not result['tasks']:
+            flash('No relevant tasks for your role.', 'info')
+        return render_template('user_tasks.html', tasks=result['tasks'], counts=result['counts'],
+                               include_archive=include_archive, limit=result['limit'], offset=result['offset'])
     except Exception as e:
         current_app.logger.error(f"Error in user_tasks: {e}")
         flash(f"An error occurred: {e}", 'danger')
-        return render_template('user_tasks.html', orders=[], role=None)
+        return render_template('user_tasks.html', tasks={}, counts={}, include_archive=include_archive,
+                               limit=page[0], offset=page[1])
+
+
+@routes_bp.route('/api/user_tasks', methods=['GET'])
+@login_required
+def user_tasks_api():
+    """JSON version of user_tasks."""
+    page = task_page_args()
+    if page is None:
+        return jsonify({'error': 'Limit must be between 1 and 500 and offset a number.'}), 400
+    try:
+        return jsonify(cached_user_tasks(request.args.get('archived') == '1', *page))
+    except Exception as e:
+        current_app.logger.error(f"Error in user_tasks_api: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def fetch_category_ranking(start_date, end_date, include_archive=False):
+    """Top 5 categories/subcategories by items ordered between two dates."""
+    tables = order_tables(include_archive)
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT 
+                c.mainCategory, 
+                c.subCategory, 
+                COUNT(*) AS orderCount
+            FROM 
+                {tables['ItemIn']} ii
+            JOIN 
+                Item i ON ii.ItemID = i.ItemID
+            JOIN 
+                Category c ON i.mainCategory = c.mainCategory AND i.subCategory = c.subCategory
+            JOIN 
+                {tables['Ordered']} o ON ii.orderID = o.orderID
+            WHERE 
+                o.orderDate BETWEEN %s AND %s
+            GROUP BY 
+                c.mainCategory, c.subCategory
+            ORDER BY 
+                orderCount DESC
+            LIMIT 5;
+        """, (start_date, end_date))
+        return cursor.fetchall()
     finally:
         cursor.close()
 
@@ -470,7 +717,6 @@ def user_tasks():
 @login_required
 def rank_categories():
     """Rank system to find the most popular categories/subcategories."""
-    cursor = current_app.mysql.connection.cursor()
     ranking = []
 
     try:
@@ -478,39 +724,101 @@ def rank_categories():
             # Get the start and end date from the form
             start_date = request.form.get('startDate', '').strip()
             end_date = request.form.get('endDate', '').strip()
+            include_archive = request.form.get('includeArchive') == 'yes'
 
             if not start_date or not end_date:
                 flash('Error: Both start and end dates are required.', 'danger')
                 return redirect('/rank_categories')
 
-            # Fetch the ranking data
-            cursor.execute("""
-                SELECT 
-                    c.mainCategory, 
-                    c.subCategory, 
-                    COUNT(*) AS orderCount
-                FROM 
-                    ItemIn ii
-                JOIN 
-                    Item i ON ii.ItemID = i.ItemID
-                JOIN 
-                    Category c ON i.mainCategory = c.mainCategory AND i.subCategory = c.subCategory
-                JOIN 
-                    Ordered o ON ii.orderID = o.orderID
-                WHERE 
-                    o.orderDate BETWEEN %s AND %s
-                GROUP BY 
-                    c.mainCategory, c.subCategory
-                ORDER BY 
-                    orderCount DESC
-                LIMIT 5;
-            """, (start_date, end_date))
-
-            ranking = cursor.fetchall()
+            # Normalize the dates so equivalent requests share one cache entry
+            try:
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date().isoformat()
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date().isoformat()
+            except ValueError:
+                flash('Error: Dates must be in YYYY-MM-DD format.', 'danger')
+                return redirect('/rank_categories')
+
+            # Identical concurrent requests share one query; results are cached briefly
+            ranking = report_cache.get_or_compute(
+                ('rank_categories', start_date, end_date, include_archive),
+                lambda: fetch_category_ranking(start_date, end_date, include_archive),
+                current_app.config['REPORT_CACHE_TTL'],
+            )
     except Exception as e:
         current_app.logger.error(f"Error in rank_categories: {e}")
         flash(f"Error: Unable to fetch rankings. {str(e)}", 'danger')
+
+    return render_template('rank_categories.html', ranking=ranking)
+
+
+@routes_bp.route('/api/popular_categories', methods=['GET'])
+@login_required
+def popular_categories():
+    """Approximate most requested categories over the last hour, day or week."""
+    window = request.args.get('window', 'day').strip()
+    if window not in ('hour', 'day', 'week'):
+        return jsonify({'error': "Window must be 'hour', 'day' or 'week'."}), 400
+
+    limit = request.args.get('limit', '10').strip()
+    if not limit.isdigit() or not 0 < int(limit) <= 50:
+        return jsonify({'error': 'Limit must be a number between 1 and 50.'}), 400
+
+    return jsonify({'window': window, 'categories': popularity.top(window, int(limit))})
+
+
+@routes_bp.route('/api/recommendations', methods=['GET'])
+@login_required
+def recommend_items():
+    """Available items from categories that often go with an order's current items."""
+    order_id = request.args.get('orderID', '').strip()
+    if not order_id.isdigit():
+        return jsonify({'error': 'Order ID must be a number.'}), 400
+    limit = request.args.get('limit', '5').strip()
+    if not limit.isdigit() or not 0 < int(limit) <= 20:
+        return jsonify({'error': 'Limit must be a number between 1 and 20.'}), 400
+
+    cursor = current_app.mysql.connection.cursor()
+    try:
+        cursor.execute("SELECT client FROM Ordered WHERE orderID = %s", (order_id,))
+        order = cursor.fetchone()
+        if order is None:
+            return jsonify({'error': f'No order found with ID {order_id}.'}), 404
+        cursor.execute("""
+            SELECT DISTINCT i.mainCategory, i.subCategory
+            FROM ItemIn ii
+            JOIN Item i ON i.ItemID = ii.ItemID
+            WHERE ii.orderID = %s
+        """, (order_id,))
+        basket = [(row['mainCategory'], row['subCategory']) for row in cursor.fetchall()]
+
+        ranked = recommendations.recommend(basket, int(limit), current_app.config['RECOMMEND_MIN_SUPPORT'])
+        items = {}
+        if ranked:
+            pairs = ', '.join(['(%s, %s)'] * len(ranked))
+            cursor.execute(f"""
+                SELECT ItemID, iDescription, mainCategory, subCategory
+                FROM (
+                    SELECT ItemID, iDescription, mainCategory, subCategory,
+                           ROW_NUMBER() OVER (PARTITION BY mainCategory, subCategory ORDER BY ItemID) AS position
+                    FROM Item
+                    WHERE (mainCategory, subCategory) IN ({pairs})
+                      AND ItemID NOT IN (SELECT ItemID FROM ItemIn)
+                      AND ItemID NOT IN (SELECT ItemID FROM ItemInArchive)
+                      AND {NOT_RESERVED_FOR_OTHERS}
+                ) available
+                WHERE position <= 5
+            """, (*(value for category, _ in ranked for value in category), order['client']))
+            for row in cursor.fetchall():
+                items.setdefault((row['mainCategory'], row['subCategory']), []).append(
+                    {'ItemID': row['ItemID'], 'iDescription': row['iDescription']})
     finally:
         cursor.close()
 
-    return render_template('rank_categories.html', ranking=ranking)
+    return jsonify({
+        'orderID': int(order_id),
+        'recommendations': [
+            {'mainCategory': category[0], 'subCategory': category[1], 'score': round(score, 3),
+             'items': items.get(category, [])}
+            for category, score in ranked
+        ],
+    })
@@ -0,0 +1,219 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from importlib import import_module
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session whose data lives in a store; the cookie only carries its ID."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.replaced_sid = None
+
+    def rotate(self):
+        """Issue a fresh session ID (e.g. on login) and drop the old one on save."""
+        if not self.new:
+            self.replaced_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+
+class SQLiteSessionStore:
+    """Sessions in a local SQLite file, indexed by user for revocation."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connection() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    userName TEXT,
+                    data TEXT NOT NULL,
+                    expires REAL NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_user ON sessions (userName)")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=5)
+        return connection
+
+    def get(self, sid):
+        row = self._connection().execute(
+            "SELECT data, expires FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, sid, data, username, expires):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions (sid, userName, data, expires) VALUES (?, ?, ?, ?)",
+                (sid, username, json.dumps(data, separators=(',', ':')), expires))
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                connection.execute("DELETE FROM sessions WHERE expires < ?", (time.time(),))
+
+    def delete(self, sid):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def delete_user(self, username):
+        with self._connection() as connection:
+            return connection.execute("DELETE FROM sessions WHERE userName = ?", (username,)).rowcount
+
+
+class CachedSessionStore:
+    """In-memory LRU in front of another session store.
+
+    Cached entries are trusted for ``ttl`` seconds, which bounds how long a
+    session revoked by another process can still be used here.
+    """
+
+    def __init__(self, backend, max_entries=10000, ttl=30):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # sid -> (data, username, expires, cached_at)
+
+    def _remember(self, sid, data, username, expires):
+        with self._lock:
+            self._entries[sid] = (data, username, expires, time.monotonic())
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                data, _, expires, cached_at = entry
+                if expires >= time.time() and time.monotonic() - cached_at < self.ttl:
+                    self._entries.move_to_end(sid)
+                    return data
+                del self._entries[sid]
+        data = self.backend.get(sid)
+        if data is not None:
+            # Expiry is only known to the backend; trust the entry for one TTL
+            self._remember(sid, data, data.get('username'), time.time() + self.ttl)
+        return data
+
+    def set(self, sid, data, username, expires):
+        self.backend.set(sid, data, username, expires)
+        self._remember(sid, data, username, expires)
+
+    def delete(self, sid):
+        self.backend.delete(sid)
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def delete_user(self, username):
+        with self._lock:
+            for sid in [sid for sid, entry in self._entries.items() if entry[1] == username]:
+                del self._entries[sid]
+        return self.backend.delete_user(username)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface backed by a session store."""
+
+    salt = 'server-side-session'
+
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('utf-8')
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.store.get(sid)
+                if data is not None:
+                    return ServerSideSession(data, sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.replaced_sid:
+            self.store.delete(session.replaced_sid)
+            session.replaced_sid = None
+
+        if not session:
+            if session.modified:
+                if not session.new:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not (session.modified or self.should_set_cookie(app, session)):
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        self.store.set(session.sid, dict(session), session.get('username'), time.time() + lifetime)
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode('utf-8'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def init_session_store(app):
+    """Install a server-side session interface if SESSION_BACKEND is set.
+
+    SESSION_BACKEND may be None (Flask's signed cookie), 'sqlite', or a
+    'module:factory' path to a callable taking the app and returning a
+    store with get/set/delete/delete_user methods (e.g. a shared store).
+    """
+    backend = app.config.get('SESSION_BACKEND')
+    if not backend:
+        return None
+    if backend == 'sqlite':
+        store = SQLiteSessionStore(app.config['SESSION_SQLITE_PATH'])
+    else:
+        module_name, _, factory = backend.partition(':')
+        store = getattr(import_module(module_name), factory)(app)
+
+    store = CachedSessionStore(store, app.config['SESSION_CACHE_SIZE'], app.config['SESSION_CACHE_TTL'])
+    app.session_interface = ServerSideSessionInterface(store)
+    return store
+
+
+def revoke_user_sessions(app, username):
+    """Delete every stored session for a user. Returns None without a server-side store."""
+    interface = app.session_interface
+    if not isinstance(interface, ServerSideSessionInterface):
+        return None
+    return interface.store.delete_user(username)
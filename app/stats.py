@@ -0,0 +1,185 @@
+import threading
+import time
+from datetime import date, timedelta
+
+
+class DashboardCounters:
+    """Operational counts for the dashboard.
+
+    The counters are seeded from the database once, then brought up to date
+    on each read from rows appended since the last one seen: donations
+    (DonatedBy, by ItemID), new orders (Ordered, by orderID) and status
+    changes (OrderStatusLog, by logID). Those are written by every process,
+    so the counts they drive never lag other workers. Items added to an
+    order leave no such trail, so item_ordered() adjusts the available and
+    awaiting-preparation counts in this process only; other processes see
+    those changes at the next re-seed, every ``reseed_seconds``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seeded_at = None
+        self.last_seen = None   # (ItemID, orderID, logID) read up to
+        self.available_by_category = {}
+        self.open_orders = 0
+        self.awaiting_preparation = 0
+        self.deliveries_by_date = {}
+        self.donations_by_date = {}
+
+    def seed(self, connection):
+        """Load every counter; commits, to read the tables and logs from one snapshot."""
+        week_ago = date.today() - timedelta(days=7)
+        cursor = connection.cursor()
+        try:
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+            cursor.execute("""
+                SELECT (SELECT COALESCE(MAX(ItemID), 0) FROM DonatedBy) AS lastItem,
+                       (SELECT COALESCE(MAX(orderID), 0) FROM Ordered) AS lastOrder,
+                       (SELECT COALESCE(MAX(logID), 0) FROM OrderStatusLog) AS lastLog
+            """)
+            last = cursor.fetchone()
+            cursor.execute("""
+                SELECT mainCategory, COUNT(*) AS count
+                FROM Item
+                WHERE ItemID NOT IN (SELECT ItemID FROM ItemIn)
+                  AND ItemID NOT IN (SELECT ItemID FROM ItemInArchive)
+                GROUP BY mainCategory
+            """)
+            available = {row['mainCategory']: row['count'] for row in cursor.fetchall()}
+
+            cursor.execute("""
+                SELECT COUNT(*) AS openOrders,
+                       SUM(EXISTS (SELECT 1 FROM ItemIn ii WHERE ii.orderID = o.orderID)) AS awaiting
+                FROM Ordered o
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM Delivered d WHERE d.orderID = o.orderID AND d.status <> 'Picked'
+                )
+            """)
+            orders = cursor.fetchone()
+
+            cursor.execute("""
+                SELECT DATE(changedAt) AS day, COUNT(*) AS count
+                FROM OrderStatusLog
+                WHERE status = 'Delivered' AND changedAt > %s
+                GROUP BY DATE(changedAt)
+            """, (week_ago,))
+            deliveries = {row['day']: row['count'] for row in cursor.fetchall()}
+
+            cursor.execute("""
+                SELECT DATE(donateDate) AS day, COUNT(*) AS count
+                FROM DonatedBy
+                WHERE donateDate > %s
+                GROUP BY DATE(donateDate)
+            """, (week_ago,))
+            donations = {row['day']: row['count'] for row in cursor.fetchall()}
+            connection.commit()
+        finally:
+            cursor.close()
+
+        with self._lock:
+            self.available_by_category = available
+            self.open_orders = orders['openOrders'] or 0
+            self.awaiting_preparation = int(orders['awaiting'] or 0)
+            self.deliveries_by_date = deliveries
+            self.donations_by_date = donations
+            self.last_seen = (last['lastItem'], last['lastOrder'], last['lastLog'])
+            self.seeded_at = time.monotonic()
+
+    def catch_up(self, connection):
+        """Apply donations, orders and status changes recorded since the last read."""
+        with self._lock:
+            since = self.last_seen
+        last_item, last_order, last_log = since
+        cursor = connection.cursor()
+        try:
+            # Primary key range scans; usually empty
+            cursor.execute("""
+                SELECT i.mainCategory, DATE(d.donateDate) AS day, COUNT(*) AS count, MAX(d.ItemID) AS lastItem
+                FROM DonatedBy d
+                JOIN Item i ON i.ItemID = d.ItemID
+                WHERE d.ItemID > %s
+                GROUP BY i.mainCategory, DATE(d.donateDate)
+            """, (last_item,))
+            donations = cursor.fetchall()
+            cursor.execute("""
+                SELECT COUNT(*) AS count, MAX(orderID) AS lastOrder
+                FROM Ordered
+                WHERE orderID > %s
+            """, (last_order,))
+            orders = cursor.fetchone()
+            # An order leaves the open count the first time it is prepared;
+            # a failed delivery sends it back to Prepared without reopening it
+            cursor.execute("""
+                SELECT l.status, DATE(l.changedAt) AS day, COUNT(*) AS count,
+                       SUM(NOT EXISTS (SELECT 1 FROM OrderStatusLog e
+                                       WHERE e.orderID = l.orderID AND e.status = l.status
+                                         AND e.logID < l.logID)) AS firstTime,
+                       MAX(l.logID) AS lastLog
+                FROM OrderStatusLog l
+                WHERE l.logID > %s
+                GROUP BY l.status, DATE(l.changedAt)
+            """, (last_log,))
+            changes = cursor.fetchall()
+        finally:
+            cursor.close()
+        if not donations and not orders['count'] and not changes:
+            return
+
+        with self._lock:
+            # Another thread (or a re-seed) got here first
+            if self.last_seen != since:
+                return
+            for row in donations:
+                category = row['mainCategory']
+                self.available_by_category[category] = self.available_by_category.get(category, 0) + row['count']
+                self.donations_by_date[row['day']] = self.donations_by_date.get(row['day'], 0) + row['count']
+            self.open_orders += orders['count']
+            for row in changes:
+                if row['status'] == 'Prepared':
+                    prepared = int(row['firstTime'] or 0)
+                    self.open_orders = max(self.open_orders - prepared, 0)
+                    self.awaiting_preparation = max(self.awaiting_preparation - prepared, 0)
+                elif row['status'] == 'Delivered':
+                    self.deliveries_by_date[row['day']] = self.deliveries_by_date.get(row['day'], 0) + row['count']
+            self.last_seen = (max([last_item] + [row['lastItem'] for row in donations]),
+                              orders['lastOrder'] or last_order,
+                              max([last_log] + [row['lastLog'] for row in changes]))
+
+    def ensure_current(self, connection, reseed_seconds):
+        if self.seeded_at is None or time.monotonic() - self.seeded_at > reseed_seconds:
+            self.seed(connection)
+        else:
+            self.catch_up(connection)
+
+    def _adjust(self, update):
+        with self._lock:
+            if self.seeded_at is not None:
+                update()
+
+    def item_ordered(self, main_category, first_in_order):
+        def update():
+            self.available_by_category[main_category] = max(self.available_by_category.get(main_category, 0) - 1, 0)
+            if first_in_order:
+                self.awaiting_preparation += 1
+        self._adjust(update)
+
+    def snapshot(self):
+        """Return the current counts as a dict for the dashboard."""
+        today = date.today()
+        week_start = today - timedelta(days=today.weekday())
+        with self._lock:
+            for buckets in (self.deliveries_by_date, self.donations_by_date):
+                for day in [day for day in buckets if day < week_start]:
+                    del buckets[day]
+            return {
+                'availableByCategory': sorted(self.available_by_category.items(),
+                                              key=lambda entry: str(entry[0])),
+                'openOrders': self.open_orders,
+                'awaitingPreparation': self.awaiting_preparation,
+                'deliveriesToday': self.deliveries_by_date.get(today, 0),
+                'donationsThisWeek': sum(count for day, count in self.donations_by_date.items()
+                                         if day >= week_start),
+            }
+
+
+counters = DashboardCounters()
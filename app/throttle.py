@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+
+class SlidingWindowLimiter:
+    """Allow at most ``limit`` attempts per key in any ``window`` seconds.
+
+    Keys are kept in LRU order and the least recently seen key is evicted
+    once ``max_keys`` is exceeded, so memory stays bounded under a flood
+    of distinct usernames or addresses.
+    """
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._attempts = OrderedDict()  # key -> deque of attempt times
+
+    def check(self, key, now=None):
+        """Record an attempt for key. Returns 0 if allowed, else seconds to wait."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                attempts = self._attempts[key] = deque()
+                while len(self._attempts) > self.max_keys:
+                    self._attempts.popitem(last=False)
+            else:
+                self._attempts.move_to_end(key)
+
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+            if len(attempts) >= self.limit:
+                return attempts[0] + self.window - now
+            attempts.append(now)
+            return 0
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def __len__(self):
+        return len(self._attempts)
+
+
+class LoginThrottle:
+    """Per-username and per-address login limits, checked before bcrypt runs."""
+
+    def __init__(self):
+        self.by_username = None
+        self.by_address = None
+        self.metrics = Counter()
+
+    def init_app(self, app):
+        max_keys = app.config['LOGIN_LIMITER_MAX_KEYS']
+        self.by_username = SlidingWindowLimiter(*app.config['LOGIN_LIMIT_PER_USERNAME'], max_keys)
+        self.by_address = SlidingWindowLimiter(*app.config['LOGIN_LIMIT_PER_ADDRESS'], max_keys)
+
+    def check(self, username, address):
+        """Return 0 if the attempt may proceed, else seconds until it may."""
+        wait = self.by_address.check(address)
+        if wait:
+            self.metrics['rejected_address'] += 1
+            return wait
+        wait = self.by_username.check(username.lower())
+        if wait:
+            self.metrics['rejected_username'] += 1
+            return wait
+        self.metrics['allowed'] += 1
+        return 0
+
+    def succeeded(self, username):
+        """Clear a user's failures after a successful login."""
+        self.by_username.reset(username.lower())
+
+    def stats(self):
+        return {
+            **self.metrics,
+            'trackedUsernames': len(self.by_username),
+            'trackedAddresses': len(self.by_address),
+        }
+
+
+login_throttle = LoginThrottle()
@@ -1,16 +1,112 @@
+import fcntl
+import json
+import os
+import time
 import bcrypt
 from functools import wraps
-from flask import session, redirect, flash
+from flask import session, redirect, flash, current_app, has_app_context
 
-def hash_password(password):
-    """Hash a password with bcrypt."""
-    salt = bcrypt.gensalt()
+DEFAULT_BCRYPT_ROUNDS = 12
+
+def configured_rounds():
+    """The bcrypt cost configured for this app (BCRYPT_ROUNDS)."""
+    if has_app_context():
+        return current_app.config.get('BCRYPT_ROUNDS', DEFAULT_BCRYPT_ROUNDS)
+    return DEFAULT_BCRYPT_ROUNDS
+
+def hash_password(password, rounds=None):
+    """Hash a password with bcrypt at the given or configured cost."""
+    salt = bcrypt.gensalt(rounds or configured_rounds())
     return bcrypt.hashpw(password.encode('utf-8'), salt)
 
 def verify_password(password, hashed):
     """Verify a password against the stored hash."""
     return bcrypt.checkpw(password.encode('utf-8'), hashed)
 
+def password_rounds(hashed):
+    """Read the cost factor out of a bcrypt hash such as b'$2b$12$...'."""
+    try:
+        return int(hashed.split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed, rounds=None):
+    """Whether a stored hash uses a different cost than the configured one."""
+    return password_rounds(hashed) != (rounds or configured_rounds())
+
+def calibrate_bcrypt_rounds(target_ms, min_rounds=4, max_rounds=16, samples=3):
+    """Pick the highest bcrypt cost whose hashing time stays within target_ms.
+
+    Returns (rounds, timings) where timings maps each measured cost to its
+    median time in milliseconds. Each extra round doubles the work, so
+    measuring stops at the first cost over the target.
+    """
+    timings = {}
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        durations = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            bcrypt.hashpw(b'calibration-password', bcrypt.gensalt(rounds))
+            durations.append((time.perf_counter() - start) * 1000)
+        timings[rounds] = sorted(durations)[len(durations) // 2]
+        if timings[rounds] > target_ms:
+            break
+        chosen = rounds
+    return chosen, timings
+
+# Canonical role names, in the order they are listed to the user
+ROLE_NAMES = ('staff', 'volunteer', 'client', 'donor')
+
+def resolve_roles(descriptions):
+    """Map role descriptions from Act/Role to canonical role names.
+
+    A description counts as a role when it contains the role's name, so
+    'Staff Member' resolves to 'staff'. Descriptions naming no known role
+    are kept, lowercased, after the known ones.
+    """
+    descriptions = [description.strip().lower() for description in descriptions if description]
+    roles = [name for name in ROLE_NAMES if any(name in description for description in descriptions)]
+    other = sorted({description for description in descriptions
+                    if not any(name in description for name in ROLE_NAMES)})
+    return roles + other
+
+def has_role(*names):
+    """Whether the logged-in user holds any of the given roles."""
+    roles = session.get('roles')
+    if roles is None:
+        # Sessions created before roles were resolved at login
+        roles = [session.get('role', '').lower()]
+    return any(name in role for name in names for role in roles)
+
+def update_state_file(path, update):
+    """Read-modify-write a JSON state file shared by several worker processes.
+
+    ``update`` receives the saved data (None if there is none yet) and
+    returns the data to write. An exclusive lock on ``<path>.lock`` keeps
+    processes from overwriting each other's changes, and the file is
+    replaced atomically. Returns the data written.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            data = None
+            if os.path.exists(path):
+                try:
+                    with open(path) as state_file:
+                        data = json.load(state_file)
+                except ValueError:
+                    data = None
+            data = update(data)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as state_file:
+                json.dump(data, state_file)
+            os.replace(tmp_path, path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return data
+
 def login_required(f):
     """Decorator to protect routes."""
     @wraps(f)
@@ -20,3 +116,15 @@ def login_required(f):
             return redirect('/login')
         return f(*args, **kwargs)
     return decorated_function
+
+def parse_piece_code(code):
+    """Parse a scanned code of the form 'itemID' or 'itemID:pieceNum'.
+
+    Returns an (item_id, piece_num) tuple, with piece_num None for bare item
+    codes, or None if the code is malformed.
+    """
+    code = str(code).strip()
+    item_part, sep, piece_part = code.partition(':')
+    if not item_part.isdigit() or (sep and not piece_part.isdigit()):
+        return None
+    return int(item_part), int(piece_part) if sep else None
@@ -0,0 +1,230 @@
+from flask import Blueprint, request, render_template, flash, redirect, session, current_app
+from .outbox import enqueue_notification
+from .utils import login_required, has_role
+
+wishlist_bp = Blueprint('wishlist', __name__)
+
+OPEN = 'open'
+RESERVED = 'reserved'
+FULFILLED = 'fulfilled'
+CANCELLED = 'cancelled'
+
+# Condition on Item.ItemID (one parameter: the client the items are offered
+# to) leaving out items held for another client's request
+NOT_RESERVED_FOR_OTHERS = f"""ItemID NOT IN (
+    SELECT itemID FROM ClientRequest
+    WHERE status = '{RESERVED}' AND client <> %s AND itemID IS NOT NULL
+)"""
+
+
+def match_donation(cursor, item_id, main_category, sub_category, color, material, is_new):
+    """Reserve a newly donated item for the oldest open request it satisfies.
+
+    Runs in the caller's transaction. Candidates come from the
+    client_request_match index on (status, mainCategory, subCategory,
+    createdAt), so only open requests in the item's category are read;
+    optional color/material/new-only constraints are checked on that slice.
+    Returns the reserved request, or None.
+    """
+    cursor.execute("""
+        SELECT requestID, client, mainCategory, subCategory
+        FROM ClientRequest
+        WHERE status = %s AND mainCategory = %s AND subCategory = %s
+          AND (color IS NULL OR color = %s)
+          AND (material IS NULL OR material = %s)
+          AND (requireNew = FALSE OR %s)
+        ORDER BY createdAt, requestID
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    """, (OPEN, main_category, sub_category, color, material, bool(is_new)))
+    match = cursor.fetchone()
+    if match is None:
+        return None
+
+    cursor.execute("""
+        UPDATE ClientRequest
+        SET status = %s, itemID = %s, matchedAt = NOW()
+        WHERE requestID = %s
+    """, (RESERVED, item_id, match['requestID']))
+    enqueue_notification(cursor, 'wishlist_match', match['client'], requestID=match['requestID'],
+                         itemID=item_id, category=f"{main_category} / {sub_category}")
+    return match
+
+
+def match_request(cursor, request_id):
+    """Reserve the oldest available item for a request that has just reopened.
+
+    Runs in the caller's transaction. Returns the reserved item ID, or None
+    if nothing in stock fits and the request stays open.
+    """
+    cursor.execute("""
+        SELECT requestID, client, mainCategory, subCategory, color, material, requireNew
+        FROM ClientRequest
+        WHERE requestID = %s AND status = %s
+        FOR UPDATE
+    """, (request_id, OPEN))
+    wanted = cursor.fetchone()
+    if wanted is None:
+        return None
+
+    cursor.execute("""
+        SELECT ItemID
+        FROM Item
+        WHERE mainCategory = %s AND subCategory = %s
+          AND (%s IS NULL OR color = %s)
+          AND (%s IS NULL OR material = %s)
+          AND (NOT %s OR isNew)
+          AND ItemID NOT IN (SELECT ItemID FROM ItemIn)
+          AND ItemID NOT IN (SELECT ItemID FROM ItemInArchive)
+          AND ItemID NOT IN (SELECT itemID FROM ClientRequest WHERE status = %s AND itemID IS NOT NULL)
+        ORDER BY ItemID
+        LIMIT 1
+    """, (wanted['mainCategory'], wanted['subCategory'], wanted['color'], wanted['color'],
+          wanted['material'], wanted['material'], bool(wanted['requireNew']), RESERVED))
+    item = cursor.fetchone()
+    if item is None:
+        return None
+
+    cursor.execute("""
+        UPDATE ClientRequest
+        SET status = %s, itemID = %s, matchedAt = NOW()
+        WHERE requestID = %s
+    """, (RESERVED, item['ItemID'], request_id))
+    enqueue_notification(cursor, 'wishlist_match', wanted['client'], requestID=request_id,
+                         itemID=item['ItemID'], category=f"{wanted['mainCategory']} / {wanted['subCategory']}")
+    return item['ItemID']
+
+
+def item_ordered(cursor, item_id, client):
+    """Settle any reservation on an item that was just added to an order.
+
+    The reservation is fulfilled if the item went to the client who asked
+    for it; otherwise the request reopens and is matched against the items
+    still in stock.
+    """
+    cursor.execute("""
+        SELECT requestID
+        FROM ClientRequest
+        WHERE itemID = %s AND status = %s AND client <> %s
+    """, (item_id, RESERVED, client))
+    reopened = [row['requestID'] for row in cursor.fetchall()]
+    cursor.execute("""
+        UPDATE ClientRequest
+        SET status = IF(client = %s, %s, %s),
+            itemID = IF(client = %s, itemID, NULL),
+            matchedAt = IF(client = %s, matchedAt, NULL)
+        WHERE itemID = %s AND status = %s
+    """, (client, FULFILLED, OPEN, client, client, item_id, RESERVED))
+    for request_id in reopened:
+        match_request(cursor, request_id)
+
+
+def item_released(cursor, item_id):
+    """Offer an item whose reservation was withdrawn to the next matching request."""
+    cursor.execute("""
+        SELECT ItemID, mainCategory, subCategory, color, material, isNew
+        FROM Item
+        WHERE ItemID = %s
+          AND ItemID NOT IN (SELECT ItemID FROM ItemIn)
+          AND ItemID NOT IN (SELECT ItemID FROM ItemInArchive)
+    """, (item_id,))
+    item = cursor.fetchone()
+    if item is not None:
+        match_donation(cursor, item_id, item['mainCategory'], item['subCategory'],
+                       item['color'], item['material'], item['isNew'])
+
+
+@wishlist_bp.route('/wishlist', methods=['GET', 'POST'])
+@login_required
+def wishlist():
+    """Clients list what they need; staff can add requests on a client's behalf."""
+    is_staff = has_role('staff')
+    if not is_staff and not has_role('client'):
+        flash('Access denied. Only clients and staff can use the wishlist.', 'danger')
+        return redirect('/dashboard')
+
+    connection = current_app.mysql.connection
+    cursor = connection.cursor()
+    try:
+        if request.method == 'POST':
+            client = request.form.get('client', '').strip() if is_staff else session['username']
+            main_category = request.form.get('mainCategory', '').strip()
+            sub_category = request.form.get('subCategory', '').strip()
+            if not client or not main_category or not sub_category:
+                flash('Client, main category and subcategory are required.', 'danger')
+                return redirect('/wishlist')
+
+            cursor.execute("SELECT 1 FROM Act WHERE userName = %s AND roleID = 'client'", (client,))
+            if cursor.fetchone() is None:
+                flash(f"No client found with username {client}.", 'danger')
+                return redirect('/wishlist')
+            cursor.execute("SELECT 1 FROM Category WHERE mainCategory = %s AND subCategory = %s",
+                           (main_category, sub_category))
+            if cursor.fetchone() is None:
+                flash('Unknown category.', 'danger')
+                return redirect('/wishlist')
+
+            cursor.execute("""
+                INSERT INTO ClientRequest (client, mainCategory, subCategory, color, material, requireNew, notes)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (client, main_category, sub_category,
+                  request.form.get('color', '').strip() or None,
+                  request.form.get('material', '').strip() or None,
+                  request.form.get('requireNew') == 'yes',
+                  request.form.get('notes', '').strip()))
+            connection.commit()
+            flash('Request added. We will let you know when a matching donation arrives.', 'success')
+            return redirect('/wishlist')
+
+        where, params = "WHERE r.status IN (%s, %s)", [OPEN, RESERVED]
+        if not is_staff:
+            where += " AND r.client = %s"
+            params.append(session['username'])
+        cursor.execute(f"""
+            SELECT r.requestID, r.client, r.mainCategory, r.subCategory, r.color, r.material,
+                   r.requireNew, r.notes, r.status, r.itemID, r.createdAt, r.matchedAt,
+                   i.iDescription
+            FROM ClientRequest r
+            LEFT JOIN Item i ON i.ItemID = r.itemID
+            {where}
+            ORDER BY r.status DESC, r.createdAt
+        """, tuple(params))
+        client_requests = cursor.fetchall()
+
+        cursor.execute("SELECT DISTINCT mainCategory FROM Category ORDER BY mainCategory")
+        categories = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    return render_template('wishlist.html', client_requests=client_requests, categories=categories, is_staff=is_staff)
+
+
+@wishlist_bp.route('/wishlist/<int:request_id>/cancel', methods=['POST'])
+@login_required
+def cancel_request(request_id):
+    """Withdraw an open or reserved request, passing any reserved item to the next request."""
+    connection = current_app.mysql.connection
+    cursor = connection.cursor()
+    try:
+        where, params = "WHERE requestID = %s AND status IN (%s, %s)", [request_id, OPEN, RESERVED]
+        if not has_role('staff'):
+            where += " AND client = %s"
+            params.append(session['username'])
+        cursor.execute(f"SELECT itemID FROM ClientRequest {where} FOR UPDATE", tuple(params))
+        cancelled = cursor.fetchone()
+        if cancelled is not None:
+            cursor.execute("""
+                UPDATE ClientRequest
+                SET status = %s, itemID = NULL, matchedAt = NULL
+                WHERE requestID = %s
+            """, (CANCELLED, request_id))
+            if cancelled['itemID'] is not None:
+                item_released(cursor, cancelled['itemID'])
+        connection.commit()
+        if cancelled is not None:
+            flash(f"Request {request_id} cancelled.", 'success')
+        else:
+            flash(f"Request {request_id} not found or already closed.", 'danger')
+    finally:
+        cursor.close()
+    return redirect('/wishlist')
@@ -5,3 +5,115 @@ class Config:
     MYSQL_DB = 'WelcomeHome'
     MYSQL_HOST = 'localhost'
     MYSQL_CURSORCLASS = 'DictCursor'
+
+    # Maximum number of codes accepted by one /api/find_items request
+    SCAN_BATCH_LIMIT = 500
+
+    # Uploaded user lists waiting for the 'provision_users' background job;
+    # they hold plaintext passwords, so lists whose job never ran are
+    # deleted after this many hours
+    PROVISION_UPLOAD_DIR = 'instance/provisioning'
+    PROVISION_UPLOAD_KEEP_HOURS = 24
+
+    # Label sheets (PDF, rendered with reportlab by the 'labels' background
+    # job), and days a finished sheet is kept
+    LABEL_OUTPUT_DIR = 'instance/labels'
+    LABEL_KEEP_DAYS = 7
+
+    # Inventory counts: uploaded scans and reports, scans sorted in memory per
+    # run, and days a finished report is kept
+    CYCLE_COUNT_DIR = 'instance/cycle_counts'
+    CYCLE_COUNT_RUN_SIZE = 50000
+    CYCLE_COUNT_KEEP_DAYS = 14
+
+    # Picking sessions flush ItemIn.found after this many scans or milliseconds
+    PICKING_FLUSH_SCANS = 20
+    PICKING_FLUSH_MS = 2000
+    # ...and are discarded (after a final flush) when idle this long (seconds)
+    PICKING_IDLE_SECONDS = 1800
+
+    # Server-sent event streams send a keep-alive comment this often
+    EVENT_HEARTBEAT_SECONDS = 15
+
+    # Dashboard counters follow donations, new orders and status changes on
+    # every read; items added to orders by other processes (available items,
+    # orders awaiting preparation) show up at the next full re-seed, this
+    # often (seconds)
+    DASHBOARD_RESEED_SECONDS = 300
+
+    # Per-shelf location summaries follow the PieceMovement log on every
+    # read; a full re-seed this often (seconds) is only a consistency backstop
+    LOCATION_RESEED_SECONDS = 600
+
+    # Streaming category popularity (Space-Saving top-k per time bucket)
+    POPULARITY_STATE_PATH = 'instance/category_popularity.json'
+    POPULARITY_PERSIST_SECONDS = 60
+    POPULARITY_CAPACITY = 50
+
+    # Category co-occurrence recommendations ('build-recommendations' rebuilds)
+    RECOMMEND_STATE_PATH = 'instance/category_cooccurrence.json'
+    RECOMMEND_PERSIST_SECONDS = 60
+    RECOMMEND_MIN_SUPPORT = 2
+
+    # Near-duplicate donation detection (MinHash LSH over recent donations)
+    DEDUPE_CAPACITY = 5000
+    DEDUPE_PERMUTATIONS = 64
+    DEDUPE_BANDS = 16
+    DEDUPE_THRESHOLD = 0.8
+
+    # Seconds a report result (e.g. rank_categories) is served from cache
+    REPORT_CACHE_TTL = 300
+
+    # Server-side sessions: None keeps Flask's signed cookie, 'sqlite' uses a
+    # local file, 'module:factory' plugs in a shared store
+    SESSION_BACKEND = None
+    SESSION_SQLITE_PATH = 'instance/sessions.sqlite3'
+    SESSION_CACHE_SIZE = 10000
+    SESSION_CACHE_TTL = 30
+
+    # Login throttling: (attempts, window in seconds) per username and per
+    # client address, checked before the password hash is verified
+    LOGIN_LIMIT_PER_USERNAME = (5, 300)
+    LOGIN_LIMIT_PER_ADDRESS = (30, 300)
+    LOGIN_LIMITER_MAX_KEYS = 10000
+
+    # bcrypt cost for new hashes; run `flask calibrate-bcrypt` to pick one
+    # for this host. Hashes at another cost are upgraded on login.
+    BCRYPT_ROUNDS = 12
+    BCRYPT_TARGET_MS = 250
+
+    # Notification outbox ('log', 'smtp' or 'module:factory' transport). Run
+    # `flask outbox-worker`, or enable an in-process worker for the
+    # development server started by run.py.
+    OUTBOX_WORKER_ENABLED = False
+    OUTBOX_TRANSPORT = 'log'
+    OUTBOX_SENDER = 'WelcomeHome <noreply@welcomehome.local>'
+    OUTBOX_SMTP_HOST = 'localhost'
+    OUTBOX_SMTP_PORT = 1025
+    OUTBOX_BATCH_SIZE = 50
+    OUTBOX_POLL_SECONDS = 5
+    OUTBOX_MAX_ATTEMPTS = 5
+    OUTBOX_RETRY_BASE_SECONDS = 30
+    # A claimed batch is retried by another worker if not settled within this
+    OUTBOX_CLAIM_SECONDS = 600
+
+    # Background job queue (Job table). Run `flask job-worker`, or enable
+    # in-process workers for the development server started by run.py.
+    JOB_WORKER_ENABLED = False
+    JOB_WORKER_THREADS = 2
+    JOB_POLL_SECONDS = 2
+    JOB_STALE_SECONDS = 3600
+
+    # Hot/cold archival of completed orders ('archive_orders' job)
+    ARCHIVE_AFTER_DAYS = 180
+    ARCHIVE_BATCH_SIZE = 500
+    ARCHIVE_STATUSES = ('Delivered',)
+
+    # Seconds a user's task list is cached (writes invalidate it sooner)
+    USER_TASKS_CACHE_TTL = 30
+
+    # Default cargo space for load planning (same units as Piece dimensions),
+    # used when a /deliveries/loadplan request doesn't list its vehicles
+    DELIVERY_VEHICLES = (
+        {'name': 'van', 'length': 300, 'width': 170, 'height': 140},
+    )
@@ -1,6 +1,16 @@
+import os
 from app import create_app
 
 app = create_app()
 
 if __name__ == '__main__':
+    # With the debug reloader, only the serving child process runs jobs and
+    # delivers notifications
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        if app.config['JOB_WORKER_ENABLED']:
+            from app.jobs import start_workers
+            start_workers(app)
+        if app.config['OUTBOX_WORKER_ENABLED']:
+            from app.outbox import start_worker
+            start_worker(app)
     app.run(debug=True)
@@ -0,0 +1,156 @@
+-- Tables and indexes added on top of the WelcomeHome project schema.
+-- Apply with: mysql WelcomeHome < schema.sql
+
+-- Notifications written in the same transaction as the change they report,
+-- delivered later by the outbox worker (app/outbox.py)
+CREATE TABLE IF NOT EXISTS Outbox (
+    messageID INT AUTO_INCREMENT PRIMARY KEY,
+    eventType VARCHAR(50) NOT NULL,
+    recipient VARCHAR(50) NOT NULL,
+    payload TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    nextAttemptAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    createdAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sentAt DATETIME NULL,
+    lastError TEXT NULL,
+    INDEX outbox_due (status, nextAttemptAt)
+);
+
+-- Background jobs run by the job worker (app/jobs.py)
+CREATE TABLE IF NOT EXISTS Job (
+    jobID INT AUTO_INCREMENT PRIMARY KEY,
+    jobType VARCHAR(50) NOT NULL,
+    payload MEDIUMTEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    progress INT NOT NULL DEFAULT 0,
+    message VARCHAR(255) NULL,
+    result MEDIUMTEXT NULL,
+    createdBy VARCHAR(50) NULL,
+    cancelRequested BOOLEAN NOT NULL DEFAULT FALSE,
+    createdAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    startedAt DATETIME NULL,
+    finishedAt DATETIME NULL,
+    updatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX job_queue (status, jobType, jobID)
+);
+
+-- Cold copies of completed orders moved out of the hot tables by the
+-- 'archive_orders' job (app/archive.py)
+CREATE TABLE IF NOT EXISTS OrderedArchive LIKE Ordered;
+CREATE TABLE IF NOT EXISTS ItemInArchive LIKE ItemIn;
+CREATE TABLE IF NOT EXISTS DeliveredArchive LIKE Delivered;
+
+-- Per-user task lookups (routes.load_user_tasks). MySQL has no CREATE INDEX
+-- IF NOT EXISTS, so indexes on existing tables are created through a
+-- prepared statement only when information_schema doesn't list them yet
+SET @ddl = IF(EXISTS(SELECT 1 FROM information_schema.statistics
+                     WHERE table_schema = DATABASE() AND table_name = 'Ordered' AND index_name = 'ordered_client_date'),
+              'DO 0', 'CREATE INDEX ordered_client_date ON Ordered (client, orderDate)');
+PREPARE ddl FROM @ddl; EXECUTE ddl; DEALLOCATE PREPARE ddl;
+SET @ddl = IF(EXISTS(SELECT 1 FROM information_schema.statistics
+                     WHERE table_schema = DATABASE() AND table_name = 'Ordered' AND index_name = 'ordered_supervisor_date'),
+              'DO 0', 'CREATE INDEX ordered_supervisor_date ON Ordered (supervisor, orderDate)');
+PREPARE ddl FROM @ddl; EXECUTE ddl; DEALLOCATE PREPARE ddl;
+SET @ddl = IF(EXISTS(SELECT 1 FROM information_schema.statistics
+                     WHERE table_schema = DATABASE() AND table_name = 'Delivered' AND index_name = 'delivered_user_date'),
+              'DO 0', 'CREATE INDEX delivered_user_date ON Delivered (userName, date)');
+PREPARE ddl FROM @ddl; EXECUTE ddl; DEALLOCATE PREPARE ddl;
+-- Current status of an order (lifecycle.current_status), in the hot and
+-- the archive table
+SET @ddl = IF(EXISTS(SELECT 1 FROM information_schema.statistics
+                     WHERE table_schema = DATABASE() AND table_name = 'Delivered' AND index_name = 'delivered_order_date'),
+              'DO 0', 'CREATE INDEX delivered_order_date ON Delivered (orderID, date, userName)');
+PREPARE ddl FROM @ddl; EXECUTE ddl; DEALLOCATE PREPARE ddl;
+SET @ddl = IF(EXISTS(SELECT 1 FROM information_schema.statistics
+                     WHERE table_schema = DATABASE() AND table_name = 'DeliveredArchive' AND index_name = 'delivered_order_date'),
+              'DO 0', 'CREATE INDEX delivered_order_date ON DeliveredArchive (orderID, date, userName)');
+PREPARE ddl FROM @ddl; EXECUTE ddl; DEALLOCATE PREPARE ddl;
+
+-- Order lifecycle (app/lifecycle.py): one row per stage an order enters,
+-- and an index serving the per-status work queues
+CREATE TABLE IF NOT EXISTS OrderStatusLog (
+    logID INT AUTO_INCREMENT PRIMARY KEY,
+    orderID INT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    changedBy VARCHAR(50) NOT NULL,
+    changedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX order_status_log_order (orderID, changedAt),
+    INDEX order_status_log_status (status, changedAt)
+);
+SET @ddl = IF(EXISTS(SELECT 1 FROM information_schema.statistics
+                     WHERE table_schema = DATABASE() AND table_name = 'Delivered' AND index_name = 'delivered_status_date'),
+              'DO 0', 'CREATE INDEX delivered_status_date ON Delivered (status, date, orderID)');
+PREPARE ddl FROM @ddl; EXECUTE ddl; DEALLOCATE PREPARE ddl;
+
+-- Delivery assignment (app/assignment.py): days each volunteer can deliver
+-- and how much they can take; NULL means no limit
+CREATE TABLE IF NOT EXISTS VolunteerAvailability (
+    userName VARCHAR(50) NOT NULL,
+    availableDate DATE NOT NULL,
+    maxOrders INT NULL,
+    maxVolume BIGINT NULL,
+    PRIMARY KEY (userName, availableDate),
+    INDEX volunteer_availability_date (availableDate),
+    FOREIGN KEY (userName) REFERENCES Person(userName)
+);
+
+-- Client wishlist (app/wishlist.py): things clients are waiting for. Each
+-- accepted donation reserves the oldest open request it satisfies, found
+-- through client_request_match rather than a scan of every request
+CREATE TABLE IF NOT EXISTS ClientRequest (
+    requestID INT AUTO_INCREMENT PRIMARY KEY,
+    client VARCHAR(50) NOT NULL,
+    mainCategory VARCHAR(50) NOT NULL,
+    subCategory VARCHAR(50) NOT NULL,
+    color VARCHAR(20) NULL,
+    material VARCHAR(50) NULL,
+    requireNew BOOLEAN NOT NULL DEFAULT FALSE,
+    notes TEXT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'open',
+    itemID INT NULL,
+    createdAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    matchedAt DATETIME NULL,
+    INDEX client_request_match (status, mainCategory, subCategory, createdAt),
+    INDEX client_request_client (client, status),
+    INDEX client_request_item (itemID),
+    FOREIGN KEY (client) REFERENCES Person(userName)
+);
+
+-- Suspected duplicate donations awaiting review (app/dedupe.py)
+CREATE TABLE IF NOT EXISTS DuplicateFlag (
+    flagID INT AUTO_INCREMENT PRIMARY KEY,
+    itemID INT NOT NULL,
+    duplicateOf INT NOT NULL,
+    similarity DECIMAL(4, 3) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'open',
+    createdAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    reviewedBy VARCHAR(50) NULL,
+    reviewedAt DATETIME NULL,
+    INDEX duplicate_flag_status (status, createdAt),
+    UNIQUE KEY duplicate_flag_pair (itemID, duplicateOf)
+);
+
+-- Append-only piece movement log (app/movements.py). Piece.roomNum/shelfNum
+-- stay the current location; every change is also recorded here
+CREATE TABLE IF NOT EXISTS PieceMovement (
+    movementID BIGINT AUTO_INCREMENT PRIMARY KEY,
+    itemID INT NOT NULL,
+    pieceNum INT NOT NULL,
+    fromRoom INT NULL,
+    fromShelf INT NULL,
+    toRoom INT NOT NULL,
+    toShelf INT NOT NULL,
+    movedBy VARCHAR(50) NOT NULL,
+    reason VARCHAR(100) NULL,
+    movedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX piece_movement_piece (itemID, pieceNum, movedAt),
+    INDEX piece_movement_time (movedAt)
+);
+
+-- Shelf contents browser (app/locations.py): pages through one shelf's
+-- pieces in primary key order without sorting or offset scans
+SET @ddl = IF(EXISTS(SELECT 1 FROM information_schema.statistics
+                     WHERE table_schema = DATABASE() AND table_name = 'Piece' AND index_name = 'piece_location'),
+              'DO 0', 'CREATE INDEX piece_location ON Piece (roomNum, shelfNum, itemID, pieceNum)');
+PREPARE ddl FROM @ddl; EXECUTE ddl; DEALLOCATE PREPARE ddl;